@@ -0,0 +1,65 @@
+import datetime
+import gzip
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from activitypub.models.activity import Activity
+from activitypub.utils import generate_ulid
+
+log = logging.getLogger(__name__)
+
+
+def get_archive_storage() -> FileSystemStorage:
+    # Not the media storage, archived activities are not meant to be public.
+    return FileSystemStorage(location=settings.ACTIVITYPUB_ARCHIVE_ROOT)
+
+
+def archive_activities(older_than_days: int = None, batch_size: int = None) -> int:
+    """
+    Moves remote activities that were processed more than older_than_days ago to
+    the archive storage, as gzipped JSON lines files of batch_size activities.
+    Activities that workouts still refer to are kept.
+
+    Returns the number of activities that were archived.
+    """
+    older_than_days = older_than_days or settings.ACTIVITYPUB_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ACTIVITYPUB_ARCHIVE_BATCH_SIZE
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+    activities = Activity.objects.filter(
+        is_remote=True,
+        processed_on__lt=cutoff,
+        workout_activities__isnull=True,
+        note_activities__isnull=True,
+    ).order_by("processed_on")
+
+    storage = get_archive_storage()
+    archived = 0
+    while True:
+        batch = list(
+            activities.values(
+                "id",
+                "actor_id",
+                "activity_type",
+                "raw_activity",
+                "created_on",
+                "processed_on",
+            )[:batch_size]
+        )
+        if not batch:
+            return archived
+
+        lines = "\n".join(json.dumps(row, cls=DjangoJSONEncoder) for row in batch)
+        name = storage.save(
+            f"activities/{datetime.date.today().isoformat()}/{generate_ulid()}.jsonl.gz",
+            ContentFile(gzip.compress(lines.encode("utf-8"))),
+        )
+        # Only delete once the batch is safely stored.
+        Activity.objects.filter(pk__in=[row["id"] for row in batch]).delete()
+        archived += len(batch)
+        log.debug("Archived %s activities to %s", len(batch), name)
@@ -0,0 +1,124 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+
+from activitypub.models.activity import Activity
+from activitypub.models.actor import Actor
+
+log = logging.getLogger(__name__)
+
+PUBLIC_COLLECTIONS = {
+    "https://www.w3.org/ns/activitystreams#Public",
+    "as:Public",
+    "Public",
+}
+AUDIENCE_FIELDS = ("to", "cc", "bto", "bcc", "audience")
+
+
+def follower_inboxes_cache_key(actor: Actor) -> str:
+    return f"follower-inboxes:{actor.pk}"
+
+
+def invalidate_follower_inboxes(actor: Actor):
+    cache.delete(follower_inboxes_cache_key(actor))
+
+
+Recipient = Tuple[Optional[str], Optional[str]]
+
+
+def collapse_recipients(recipients: Iterable[Recipient]) -> List[Recipient]:
+    """
+    Reduces (inbox_url, shared_inbox_url) pairs to the smallest set of deliveries.
+    Every host gets a single delivery on its shared inbox when it has one,
+    recipients on hosts without a shared inbox get their own delivery. The
+    result is made of the same pairs, so it can be collapsed again when
+    combined with other recipients.
+    """
+    shared_inboxes: Dict[str, str] = {}
+    inboxes: Set[str] = set()
+
+    for inbox_url, shared_inbox_url in recipients:
+        if shared_inbox_url:
+            shared_inboxes.setdefault(
+                urlparse(shared_inbox_url).netloc, shared_inbox_url
+            )
+        elif inbox_url:
+            inboxes.add(inbox_url)
+
+    collapsed = [
+        (None, shared_inbox_url) for shared_inbox_url in shared_inboxes.values()
+    ]
+    collapsed.extend(
+        (inbox_url, None)
+        for inbox_url in inboxes
+        if urlparse(inbox_url).netloc not in shared_inboxes
+    )
+    return sorted(collapsed, key=lambda recipient: recipient[0] or recipient[1])
+
+
+def get_follower_recipients(actor: Actor) -> List[Recipient]:
+    """
+    Returns the collapsed deliveries that reach all remote followers of actor.
+    The result is cached until the follower set of actor changes.
+    """
+    cache_key = follower_inboxes_cache_key(actor)
+    recipients = cache.get(cache_key)
+    if recipients is not None:
+        return recipients
+
+    recipients = collapse_recipients(
+        Actor.objects.filter(
+            following__target=actor, following__accepted=True, is_remote=True
+        ).values_list("inbox_url", "shared_inbox_url")
+    )
+    cache.set(
+        cache_key, recipients, timeout=settings.ACTIVITYPUB_AUDIENCE_CACHE_TIMEOUT
+    )
+    return recipients
+
+
+def _get_addressed_uris(data: Dict[str, Any]) -> Set[str]:
+    uris = set()
+    for field in AUDIENCE_FIELDS:
+        value = data.get(field) or []
+        uris.update([value] if isinstance(value, str) else value)
+
+    tags = data.get("tag") or []
+    for tag in [tags] if isinstance(tags, dict) else tags:
+        if isinstance(tag, dict) and tag.get("type") == "Mention" and tag.get("href"):
+            uris.add(tag["href"])
+
+    return uris
+
+
+def resolve_delivery_inboxes(activity: Activity) -> List[str]:
+    """
+    Expands the audience of a local activity (target, to/cc/bto/bcc/audience and
+    mentions, on the activity and its object) into the inboxes to deliver it to.
+    Local recipients and unknown actors are skipped.
+    """
+    data = activity.to_activity_json()
+    addressed = _get_addressed_uris(data)
+    if isinstance(data.get("object"), dict):
+        addressed.update(_get_addressed_uris(data["object"]))
+    addressed -= PUBLIC_COLLECTIONS
+
+    recipients = list(
+        Actor.objects.filter(actor_url__in=addressed, is_remote=True).values_list(
+            "inbox_url", "shared_inbox_url"
+        )
+    )
+    if activity.actor and activity.actor.followers_url in addressed:
+        recipients.extend(get_follower_recipients(activity.actor))
+    if activity.target and activity.target.is_remote:
+        recipients.append((activity.target.inbox_url, activity.target.shared_inbox_url))
+
+    inboxes = [
+        shared_inbox_url or inbox_url
+        for inbox_url, shared_inbox_url in collapse_recipients(recipients)
+    ]
+    log.debug("Resolved activity=%s to inboxes=%s", activity.id, inboxes)
+    return inboxes
@@ -0,0 +1,76 @@
+import json
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+ACTIVITYSTREAMS_CONTEXT = "https://www.w3.org/ns/activitystreams"
+
+
+def collection_page_url(collection_id: str, max_id: str = None) -> str:
+    """Returns the URL of the page of a collection that starts after max_id."""
+    params = {"page": "true"}
+    if max_id:
+        params["max_id"] = max_id
+    return f"{collection_id}?{urlencode(params)}"
+
+
+def ordered_collection(collection_id: str, total_items: int) -> Dict[str, Any]:
+    """
+    Returns an OrderedCollection without any items, remote servers follow
+    its first link to page through the items.
+    """
+    return {
+        "@context": ACTIVITYSTREAMS_CONTEXT,
+        "id": collection_id,
+        "type": "OrderedCollection",
+        "totalItems": total_items,
+        "first": collection_page_url(collection_id),
+    }
+
+
+def ordered_collection_page(
+    collection_id: str,
+    items: List[Any],
+    max_id: str = None,
+    next_max_id: str = None,
+) -> Dict[str, Any]:
+    """
+    Returns a single OrderedCollectionPage of a collection, next_max_id is the
+    cursor of the next page, if there is one.
+    """
+    page = {
+        "@context": ACTIVITYSTREAMS_CONTEXT,
+        "id": collection_page_url(collection_id, max_id=max_id),
+        "type": "OrderedCollectionPage",
+        "partOf": collection_id,
+        "orderedItems": items,
+    }
+
+    if next_max_id:
+        page["next"] = collection_page_url(collection_id, max_id=next_max_id)
+
+    return page
+
+
+def render_ordered_collection_page(
+    collection_id: str,
+    serialized_items: List[bytes],
+    max_id: str = None,
+    next_max_id: str = None,
+) -> bytes:
+    """
+    Same as ordered_collection_page, but serialized, for items that are already
+    serialized. The items are spliced in as is instead of being encoded again.
+    """
+    page = ordered_collection_page(
+        collection_id, items=[], max_id=max_id, next_max_id=next_max_id
+    )
+    del page["orderedItems"]
+    # Swap the closing brace of the page for the items.
+    return b"".join(
+        [
+            json.dumps(page).encode("utf-8")[:-1],
+            b', "orderedItems": [',
+            b", ".join(serialized_items),
+            b"]}",
+        ]
+    )
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+NODEINFO_DOCUMENT_CACHE_KEY = "nodeinfo-document"
+
+
+def actor_document_cache_key(webfinger: str) -> str:
+    return f"actor-document:{webfinger}"
+
+
+def webfinger_document_cache_key(webfinger: str) -> str:
+    return f"webfinger-document:{webfinger}"
+
+
+def render_document(document: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Serializes a document, returns the serialized bytes and their strong ETag."""
+    body = json.dumps(document, cls=DjangoJSONEncoder).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    return body, etag
+
+
+def get_cached_document(
+    cache_key: str, build: Callable[[], Optional[Dict[str, Any]]]
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Returns the serialized document and its ETag from the cache, or builds,
+    serializes and caches it when it's missing. Documents are cached until
+    they are explicitly invalidated. Returns None when build returns None.
+    """
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    document = build()
+    if document is None:
+        return None
+
+    cached = render_document(document)
+    cache.set(cache_key, cached, timeout=None)
+    return cached
+
+
+def document_response(
+    request: HttpRequest, body: bytes, etag: str, content_type: str
+) -> HttpResponse:
+    """Serves a serialized document, answers with a 304 when the ETag matches."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=content_type)
+
+    response.headers["ETag"] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.ACTIVITYPUB_DOCUMENT_MAX_AGE
+    )
+    return response
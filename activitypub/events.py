@@ -1,5 +1,11 @@
 import logging
-from typing import Any, Callable, Dict, List, Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 
 log = logging.getLogger(__name__)
 
@@ -9,30 +15,45 @@ def _get_fully_qualified_name(func: Callable):
 
 
 class EventSystem:
-    EVENT_ACTIVITY = "activity"
+    # Fired with actor_id and target_id once a follow relation is established or removed.
+    EVENT_FOLLOW = "follow"
+    EVENT_UNFOLLOW = "unfollow"
+    # Fired with collect_results when the node statistics are rolled up, handlers
+    # return a dict with the counts they contribute, e.g {"local_posts": 12}.
+    EVENT_NODE_STATS = "node_stats"
+
+    # Handlers run inline by default. Thread handlers run concurrently in a thread
+    # pool and are waited for, they use their own database connection so they don't
+    # see uncommitted changes. Task handlers are queued as their own Celery task once
+    # the current transaction commits, their kwargs have to be serializable.
+    MODE_INLINE = "inline"
+    MODE_THREAD = "thread"
+    MODE_TASK = "task"
+    MODES = (MODE_INLINE, MODE_THREAD, MODE_TASK)
 
     def __init__(self, initial_events=None):
         self.hooks: Dict[str, List[Callable]] = {}
-        if initial_events:
-            for event in initial_events:
-                self.hooks[event] = []
-        else:
-            self.hooks = {"activity": []}
+        self.routes: Dict[Tuple[str, Optional[str]], List[Callable]] = {}
+        self.modes: Dict[Callable, str] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        for event in initial_events or []:
+            self.hooks[event] = []
 
-    def on(self, event_name: str):
+    def on(self, event_name: str, mode: str = MODE_INLINE):
         """Decorator for registering event handlers"""
 
         def decorator(func: Callable):
-            self.register(event_name, func)
+            self.register(event_name, func, mode=mode)
             return func
 
         return decorator
 
-    def register(self, event_name: str, function: Callable):
+    def register(self, event_name: str, function: Callable, mode: str = MODE_INLINE):
         log.info(
-            "Registering new function for event=%s function=%s",
+            "Registering new function for event=%s function=%s mode=%s",
             event_name,
             _get_fully_qualified_name(function),
+            mode,
         )
 
         """Register an event handler"""
@@ -42,7 +63,11 @@ class EventSystem:
         if not callable(function):
             raise ValueError("Function is not callable.")
 
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported mode {mode}, must be one of {self.MODES}")
+
         self.hooks[event_name].append(function)
+        self.modes[function] = mode
 
     def unregister(self, event_name: str, function: Callable) -> bool:
         """Unregister an event handler"""
@@ -54,30 +79,256 @@ class EventSystem:
             return True
         return False
 
+    def get_handler(self, event_name: str, handler_name: str) -> Optional[Callable]:
+        """Looks up a registered handler by its fully qualified name."""
+        for function in self.hooks.get(event_name, []):
+            if _get_fully_qualified_name(function) == handler_name:
+                return function
+        return None
+
     def fire(
         self, event_name: str, collect_results=False, **kwargs
     ) -> Optional[List[Any]]:
-        """Fire an event and optionally collect results"""
+        """
+        Fire an event and optionally collect results. Thread handlers are started
+        first so they run alongside the inline ones, task handlers are queued and
+        don't contribute results.
+        """
         if event_name not in self.hooks:
             raise ValueError(
                 f"Unsupported event {event_name}, must be one of {list(self.hooks.keys())}"
             )
 
-        results = [] if collect_results else None
+        outcomes = self._run_handlers(
+            event_name,
+            self.hooks[event_name],
+            kwargs,
+            queue_task=lambda function: self._queue_task(event_name, function, kwargs),
+        )
+
+        if not collect_results:
+            return None
+        return [result for succeeded, result in outcomes if succeeded]
+
+    def route(
+        self,
+        activity_type: str,
+        object_type: Optional[str] = None,
+        mode: str = MODE_INLINE,
+    ):
+        """
+        Decorator for registering handlers for incoming activities, e.g
+        route("Create", "Workout"). Without an object type the handler gets every
+        activity of that type. Handlers are called with the activity.
+        """
+
+        def decorator(func: Callable):
+            self.register_route(activity_type, object_type, func, mode=mode)
+            return func
+
+        return decorator
+
+    def register_route(
+        self,
+        activity_type: str,
+        object_type: Optional[str],
+        function: Callable,
+        mode: str = MODE_INLINE,
+    ):
+        log.info(
+            "Registering new route for activity_type=%s object_type=%s function=%s mode=%s",
+            activity_type,
+            object_type,
+            _get_fully_qualified_name(function),
+            mode,
+        )
+
+        if not callable(function):
+            raise ValueError("Function is not callable.")
+
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported mode {mode}, must be one of {self.MODES}")
+
+        self.routes.setdefault((activity_type, object_type), []).append(function)
+        self.modes[function] = mode
+
+    def get_routes(
+        self, activity_type: str, object_type: Optional[str] = None
+    ) -> List[Callable]:
+        """Returns the handlers for an activity, the ones for any object type last."""
+        handlers = list(self.routes.get((activity_type, object_type), []))
+        if object_type is not None:
+            handlers.extend(self.routes.get((activity_type, None), []))
+        return handlers
+
+    def get_route_handler(self, handler_name: str) -> Optional[Callable]:
+        """Looks up a routed handler by its fully qualified name."""
+        for functions in self.routes.values():
+            for function in functions:
+                if _get_fully_qualified_name(function) == handler_name:
+                    return function
+        return None
+
+    def is_routed(self, activity_type: str, object_type: Optional[str] = None) -> bool:
+        return bool(self.get_routes(activity_type, object_type))
 
-        for function in self.hooks[event_name]:
+    def dispatch(self, activity) -> bool:
+        """
+        Passes an incoming activity to the handlers routed for its type and object
+        type. Returns False when nothing handles it.
+        """
+        object_type = (
+            activity.object_json.get("type")
+            if isinstance(activity.object_json, dict)
+            else None
+        )
+        handlers = self.get_routes(activity.activity_type, object_type)
+        if not handlers:
+            log.debug(
+                "No route for activity=%s type=%s object_type=%s",
+                activity.id,
+                activity.activity_type,
+                object_type,
+            )
+            return False
+
+        self._run_handlers(
+            f"{activity.activity_type}:{object_type}",
+            handlers,
+            {"activity": activity},
+            queue_task=lambda function: self._queue_activity_task(activity, function),
+        )
+        return True
+
+    def _run_handlers(
+        self,
+        event_name: str,
+        handlers: List[Callable],
+        kwargs: Dict[str, Any],
+        queue_task: Callable[[Callable], None],
+    ) -> List[Tuple[bool, Any]]:
+        outcomes: List[Tuple[bool, Any]] = []
+        futures: List[Future] = []
+
+        for function in handlers:
+            mode = self.modes.get(function, self.MODE_INLINE)
+            if mode == self.MODE_THREAD:
+                futures.append(
+                    self._get_executor().submit(
+                        self._run_in_thread, event_name, function, kwargs
+                    )
+                )
+            elif mode == self.MODE_TASK:
+                queue_task(function)
+
+        for function in handlers:
+            if self.modes.get(function, self.MODE_INLINE) == self.MODE_INLINE:
+                outcomes.append(self.run_handler(event_name, function, kwargs))
+
+        outcomes.extend(future.result() for future in futures)
+        return outcomes
+
+    def run_handler(
+        self, event_name: str, function: Callable, kwargs: Dict[str, Any]
+    ) -> Tuple[bool, Any]:
+        """Runs a single handler, records its timing and whether it failed."""
+        handler_name = _get_fully_qualified_name(function)
+        started = time.monotonic()
+        try:
+            result = function(**kwargs)
+            succeeded = True
+        except Exception as e:
+            log.error("Error in event handler %s: %s", handler_name, e)
+            result = None
+            succeeded = False
+
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        log.debug(
+            "Ran event handler event=%s function=%s elapsed_ms=%s succeeded=%s",
+            event_name,
+            handler_name,
+            elapsed_ms,
+            succeeded,
+        )
+        self._record(handler_name, elapsed_ms, succeeded)
+        return succeeded, result
+
+    def get_handler_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the number of calls, failures and the total time spent (in ms) of
+        every registered handler, counted across all processes.
+        """
+        stats = {}
+        for functions in [*self.hooks.values(), *self.routes.values()]:
+            for function in functions:
+                handler_name = _get_fully_qualified_name(function)
+                keys = {
+                    metric: f"event-handler:{handler_name}:{metric}"
+                    for metric in ("calls", "failures", "time_ms")
+                }
+                values = cache.get_many(keys.values())
+                stats[handler_name] = {
+                    metric: values.get(key, 0) for metric, key in keys.items()
+                }
+        return stats
+
+    def _record(self, handler_name: str, elapsed_ms: int, succeeded: bool):
+        metrics = {"calls": 1, "time_ms": elapsed_ms}
+        if not succeeded:
+            metrics["failures"] = 1
+
+        for metric, value in metrics.items():
+            key = f"event-handler:{handler_name}:{metric}"
             try:
-                result = function(**kwargs)
-                if collect_results:
-                    results.append(result)
+                # Add first, incr fails on missing keys.
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, value)
             except Exception as e:
-                log.error("Error in event handler %s: %s", {function.__name__}, e)
+                # Never let bookkeeping break the handler itself.
+                log.warning("Failed to record event handler stats: %s", e)
+
+    def _run_in_thread(
+        self, event_name: str, function: Callable, kwargs: Dict[str, Any]
+    ) -> Tuple[bool, Any]:
+        try:
+            return self.run_handler(event_name, function, kwargs)
+        finally:
+            # Every pool thread gets its own database connection.
+            connection.close()
+
+    def _queue_task(self, event_name: str, function: Callable, kwargs: Dict[str, Any]):
+        from activitypub.tasks.run_event_handler import run_event_handler
 
-        return results
+        run_event_handler.delay_on_commit(
+            event_name=event_name,
+            handler_name=_get_fully_qualified_name(function),
+            kwargs=kwargs,
+        )
+
+    def _queue_activity_task(self, activity, function: Callable):
+        from activitypub.tasks.run_event_handler import run_activity_handler
+
+        run_activity_handler.delay_on_commit(
+            activity_id=activity.pk, handler_name=_get_fully_qualified_name(function)
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.ACTIVITYPUB_EVENT_THREADS,
+                thread_name_prefix="events",
+            )
+        return self._executor
 
 
 # Create a singleton instance
-events = EventSystem(initial_events=[EventSystem.EVENT_ACTIVITY])
+events = EventSystem(
+    initial_events=[
+        EventSystem.EVENT_FOLLOW,
+        EventSystem.EVENT_UNFOLLOW,
+        EventSystem.EVENT_NODE_STATS,
+    ]
+)
 
 # Export the instance
 __all__ = ["events"]
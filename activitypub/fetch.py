@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+_client: Optional[httpx.Client] = None
+
+
+def get_client() -> httpx.Client:
+    """
+    Returns the HTTP client that is shared by every fetch in this process, so
+    connections to the same remote servers are kept alive and reused.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.Client(
+            headers={"Accept": "application/activity+json"},
+            timeout=httpx.Timeout(
+                settings.ACTIVITYPUB_FETCH_TIMEOUT,
+                connect=settings.ACTIVITYPUB_FETCH_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.ACTIVITYPUB_FETCH_MAX_CONNECTIONS
+            ),
+            follow_redirects=True,
+        )
+    return _client
+
+
+def _object_cache_key(url: str) -> str:
+    return f"remote-object:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def _request_object(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = get_client().get(url)
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        log.warning("Failed to fetch remote object url=%s error=%s", url, e)
+        return None
+
+
+def fetch_object(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetches a remote ActivityPub object, returns None when it can't be fetched.
+
+    Responses are cached by URL. Concurrent fetches of the same URL, from any
+    worker, are coalesced: the first one takes a lock and fetches, the others
+    wait for its response to show up in the cache instead of fetching again.
+    """
+    cache_key = _object_cache_key(url)
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
+    lock_key = f"{cache_key}:lock"
+    timeout = settings.ACTIVITYPUB_FETCH_TIMEOUT
+    if not cache.add(lock_key, 1, timeout=timeout * 2):
+        # Someone else is fetching it, wait for their response.
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            data = cache.get(cache_key)
+            if data is not None:
+                return data
+            if cache.get(lock_key) is None:
+                break
+
+        log.debug("Gave up waiting for a concurrent fetch of url=%s", url)
+        return _request_object(url)
+
+    try:
+        data = _request_object(url)
+        if data is not None:
+            cache.set(cache_key, data, timeout=settings.ACTIVITYPUB_FETCH_CACHE_TIMEOUT)
+        return data
+    finally:
+        cache.delete(lock_key)
@@ -1,19 +1,28 @@
 import logging
 import os
+from io import BytesIO
+from typing import List
 from urllib.parse import urlencode, urlparse
 
 import bleach
 import httpx
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.base import ContentFile
 
 import activitypub.crypto as ap_crypto
+from activitypub.audience import resolve_delivery_inboxes
+from activitypub.events import events
 from activitypub.exceptions import UsernameExists
 from activitypub.models import Activity, Follower
 from activitypub.models.actor import Actor
 from activitypub.tasks.publish_activity import publish_activity
-from activitypub.utils import get_actor_urls, webfinger_from_url
+from activitypub.utils import (
+    ed25519_public_key_from_multibase,
+    get_actor_urls,
+    webfinger_from_url,
+)
+from fedletic import images
+from fedletic.tasks import generate_image_variants
 
 log = logging.getLogger(__name__)
 
@@ -38,7 +47,10 @@ def create_actor(username):
         raise UsernameExists()
 
     urls = get_actor_urls(username)
-    private_key, public_key = ap_crypto.generate_keys()
+    private_key, public_key = ap_crypto.generate_keys(key_type=ap_crypto.KEY_TYPE_RSA)
+    ed25519_private_key, ed25519_public_key = ap_crypto.generate_keys(
+        key_type=ap_crypto.KEY_TYPE_ED25519
+    )
     profile_url = f"https://{settings.SITE_URL}/@{webfinger}"
 
     actor = Actor.objects.create(
@@ -52,6 +64,9 @@ def create_actor(username):
         following_url=urls["following"],
         private_key=private_key,
         public_key=public_key,
+        ed25519_private_key=ed25519_private_key,
+        ed25519_public_key=ed25519_public_key,
+        ed25519_key_id=f"{urls['actor']}#ed25519-key",
     )
 
     return actor
@@ -90,6 +105,8 @@ def webfinger_lookup(user_id):
 def download_image_to_model(model, field_name, url):
     """
     Downloads an image from a URL and saves it to the specified model field.
+    Like uploads it's stored without its metadata, see
+    fedletic.images.remove_metadata.
 
     Args:
         model: Django model instance
@@ -107,21 +124,16 @@ def download_image_to_model(model, field_name, url):
 
         # Extract filename from URL
         parsed_url = urlparse(url)
-        filename = os.path.basename(parsed_url.path)
-
-        # If filename is empty or invalid, create a default one
-        if not filename or "." not in filename:
-            content_type = response.headers.get("Content-Type", "")
-            ext = content_type.split("/")[-1]
-            filename = f"image.{ext}"
+        filename = os.path.basename(parsed_url.path) or "image"
 
+        content = images.remove_metadata(BytesIO(response.content), filename)
         # Save to model field
         field = getattr(model, field_name)
-        field.save(filename, ContentFile(response.content), save=True)
+        field.save(content.name, content, save=True)
 
         return True
     except Exception as e:
-        print(f"Error downloading image: {e}")
+        log.warning("Failed to download image url=%s error=%s", url, e)
         return False
 
 
@@ -162,6 +174,17 @@ def fetch_remote_actor(actor_url):
         log.debug("Creating actor=%s", actor_data)
 
         shared_inbox = actor_data.get("endpoints", {}).get("sharedInbox")
+        ed25519_public_key = ed25519_key_id = None
+        for assertion_method in actor_data.get("assertionMethod") or []:
+            if isinstance(assertion_method, dict) and (
+                assertion_method.get("type") == "Multikey"
+            ):
+                ed25519_public_key = ed25519_public_key_from_multibase(
+                    assertion_method.get("publicKeyMultibase")
+                )
+                if ed25519_public_key:
+                    ed25519_key_id = assertion_method.get("id")
+                    break
         summary = sanitize_html(actor_data.get("summary", ""))
 
         # Create or update actor in local database
@@ -172,6 +195,8 @@ def fetch_remote_actor(actor_url):
                 "summary": summary,
                 "webfinger": username,
                 "public_key": public_key,
+                "ed25519_public_key": ed25519_public_key,
+                "ed25519_key_id": ed25519_key_id,
                 "is_remote": True,
                 "inbox_url": actor_data.get("inbox"),
                 "shared_inbox_url": shared_inbox,
@@ -185,14 +210,31 @@ def fetch_remote_actor(actor_url):
 
         if icon := actor_data.get("icon"):
             media_type = icon["mediaType"]
-            if "image" in media_type:
-                download_image_to_model(actor, "icon", icon["url"])
+            if "image" in media_type and download_image_to_model(
+                actor, "icon", icon["url"]
+            ):
+                generate_image_variants.delay_on_commit(
+                    actor._meta.label,
+                    actor.pk,
+                    "icon",
+                    images.AVATAR_VARIANT_WIDTHS,
+                    square=True,
+                    max_size=images.AVATAR_MAX_SIZE,
+                )
 
         # Mastodon calls header "image".
         if image := actor_data.get("image"):
             media_type = image["mediaType"]
-            if "image" in media_type:
-                download_image_to_model(actor, "header", image["url"])
+            if "image" in media_type and download_image_to_model(
+                actor, "header", image["url"]
+            ):
+                generate_image_variants.delay_on_commit(
+                    actor._meta.label,
+                    actor.pk,
+                    "header",
+                    images.HEADER_VARIANT_WIDTHS,
+                    max_size=images.HEADER_MAX_SIZE,
+                )
 
         # Cache the actor for future requests
         cache.set(cache_key, actor, timeout=3600)  # Cache for 1 hour
@@ -204,6 +246,21 @@ def fetch_remote_actor(actor_url):
         return None
 
 
+def publish_to_audience(activity: Activity) -> List[str]:
+    """
+    Delivers a local activity to everyone it's addressed to, every remote host
+    receives it once, on its shared inbox when it has one. Every delivery is
+    its own task, so a slow or dead inbox doesn't hold up the others.
+
+    Returns the inboxes the activity is delivered to.
+    """
+    inboxes = resolve_delivery_inboxes(activity)
+    for inbox_url in inboxes:
+        publish_activity.delay_on_commit(activity_id=activity.pk, inbox_url=inbox_url)
+
+    return inboxes
+
+
 def follow_actor(actor: Actor, target: Actor):
     """
     Creates a Follow activity from one actor to another.
@@ -240,4 +297,5 @@ def unfollow_actor(actor: Actor, target: Actor):
     )
     publish_activity(activity_id=activity.pk, inbox_url=target.inbox_url)
     log.info("Unfollowing actor=%s target=%s", actor, target)
-    Follower.objects.filter(actor=actor, target=target).delete()
+    Follower.unfollow(actor=actor, target=target)
+    events.fire(events.EVENT_UNFOLLOW, actor_id=actor.pk, target_id=target.pk)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_outboxes(apps, schema_editor):
+    Activity = apps.get_model("activitypub", "Activity")
+    Actor = apps.get_model("activitypub", "Actor")
+
+    counts = (
+        Activity.objects.filter(actor=OuterRef("pk"))
+        .order_by()
+        .values("actor")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Actor.objects.filter(is_remote=False).update(
+        outbox_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="outbox_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_outboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_follows(apps, schema_editor):
+    Actor = apps.get_model("activitypub", "Actor")
+    Follower = apps.get_model("activitypub", "Follower")
+
+    def counts(field):
+        return Coalesce(
+            Subquery(
+                Follower.objects.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+    Actor.objects.update(
+        followers_count=counts("target"), following_count=counts("actor")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0002_actor_outbox_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="follower",
+            index=models.Index(fields=["target", "-id"], name="follower_target_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="follower",
+            index=models.Index(fields=["actor", "-id"], name="follower_actor_id_idx"),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
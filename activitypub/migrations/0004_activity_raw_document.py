@@ -0,0 +1,146 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:21
+
+from django.db import migrations, models
+from django.db.models import F
+
+BATCH_SIZE = 1000
+SKIPPED_FIELDS = {"id", "type", "actor", "object", "published", "@context"}
+
+
+def build_raw_documents(apps, schema_editor):
+    """Local activities only had their fields stored, build their documents."""
+    Activity = apps.get_model("activitypub", "Activity")
+
+    activities = Activity.objects.filter(raw_activity__isnull=True).select_related(
+        "actor"
+    )
+    batch = []
+    for activity in activities.iterator(chunk_size=BATCH_SIZE):
+        raw_activity = {
+            "@context": activity.context or "https://www.w3.org/ns/activitystreams",
+            "id": activity.id,
+            "type": activity.activity_type,
+        }
+        if activity.actor:
+            raw_activity["actor"] = activity.actor.actor_url
+        raw_activity["object"] = activity.object_uri or activity.object_json
+        raw_activity.update(activity.additional_fields or {})
+        activity.raw_activity = raw_activity
+        batch.append(activity)
+
+        if len(batch) == BATCH_SIZE:
+            Activity.objects.bulk_update(batch, ["raw_activity"])
+            batch = []
+
+    Activity.objects.bulk_update(batch, ["raw_activity"])
+
+
+def split_raw_documents(apps, schema_editor):
+    Activity = apps.get_model("activitypub", "Activity")
+
+    batch = []
+    for activity in Activity.objects.filter(raw_activity__isnull=False).iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        activity_object = activity.raw_activity.get("object")
+        activity.context = activity.raw_activity.get("@context")
+        activity.object_uri = (
+            activity_object if isinstance(activity_object, str) else None
+        )
+        activity.object_json = (
+            activity_object if isinstance(activity_object, dict) else None
+        )
+        activity.additional_fields = {
+            key: value
+            for key, value in activity.raw_activity.items()
+            if key not in SKIPPED_FIELDS and value is not None
+        }
+        batch.append(activity)
+
+        if len(batch) == BATCH_SIZE:
+            Activity.objects.bulk_update(
+                batch, ["context", "object_uri", "object_json", "additional_fields"]
+            )
+            batch = []
+
+    Activity.objects.bulk_update(
+        batch, ["context", "object_uri", "object_json", "additional_fields"]
+    )
+
+
+def mark_processed(apps, schema_editor):
+    # Everything that was received so far went through processing already.
+    Activity = apps.get_model("activitypub", "Activity")
+    Activity.objects.filter(is_remote=True).update(processed_on=F("created_on"))
+
+
+# lz4 compresses and decompresses TOASTed documents a lot faster than the default
+# pglz, it needs PostgreSQL 14+ built with lz4 support so failing is not fatal.
+SET_LZ4_COMPRESSION = """
+DO $$
+BEGIN
+    ALTER TABLE activitypub_activity ALTER COLUMN raw_activity SET COMPRESSION lz4;
+EXCEPTION WHEN others THEN
+    RAISE NOTICE 'lz4 compression is not available, keeping the default';
+END $$;
+"""
+SET_DEFAULT_COMPRESSION = """
+DO $$
+BEGIN
+    ALTER TABLE activitypub_activity ALTER COLUMN raw_activity SET COMPRESSION default;
+EXCEPTION WHEN others THEN
+    NULL;
+END $$;
+"""
+
+
+def set_lz4_compression(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SET_LZ4_COMPRESSION)
+
+
+def set_default_compression(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SET_DEFAULT_COMPRESSION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0003_follower_counts"),
+    ]
+
+    operations = [
+        migrations.RunPython(build_raw_documents, split_raw_documents),
+        migrations.RemoveField(
+            model_name="activity",
+            name="additional_fields",
+        ),
+        migrations.RemoveField(
+            model_name="activity",
+            name="context",
+        ),
+        migrations.RemoveField(
+            model_name="activity",
+            name="object_json",
+        ),
+        migrations.RemoveField(
+            model_name="activity",
+            name="object_uri",
+        ),
+        migrations.AddField(
+            model_name="activity",
+            name="processed_on",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="activity",
+            index=models.Index(
+                condition=models.Q(("is_remote", True)),
+                fields=["processed_on"],
+                name="activity_remote_processed_idx",
+            ),
+        ),
+        migrations.RunPython(mark_processed, migrations.RunPython.noop),
+        migrations.RunPython(set_lz4_compression, set_default_compression),
+    ]
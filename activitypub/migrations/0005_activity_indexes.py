@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:22
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The activity table is big, build the indexes without locking out writes.
+    atomic = False
+
+    dependencies = [
+        ("activitypub", "0004_activity_raw_document"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="activity",
+            index=models.Index(
+                fields=["actor", "-created_on", "-id"],
+                name="activity_actor_created_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="activity",
+            index=models.Index(
+                condition=models.Q(("is_remote", False)),
+                fields=["created_on"],
+                name="activity_local_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0005_activity_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="activity",
+            name="digest",
+            field=models.CharField(
+                blank=True, editable=False, max_length=100, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="activity",
+            name="serialized",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:25
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from django.core.cache import cache
+from django.db import migrations, models
+
+from activitypub.documents import actor_document_cache_key
+
+
+def generate_ed25519_keys(apps, schema_editor):
+    Actor = apps.get_model("activitypub", "Actor")
+
+    webfingers = []
+    for actor in Actor.objects.filter(
+        is_remote=False, ed25519_private_key__isnull=True
+    ):
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        actor.ed25519_private_key = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode("utf-8")
+        actor.ed25519_public_key = (
+            private_key.public_key()
+            .public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode("utf-8")
+        )
+        actor.save(update_fields=["ed25519_private_key", "ed25519_public_key"])
+        webfingers.append(actor.webfinger)
+
+    # The cached actor documents don't publish the new keys yet.
+    cache.delete_many([actor_document_cache_key(webfinger) for webfinger in webfingers])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0006_activity_serialized"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="ed25519_private_key",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="ed25519_public_key",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(generate_ed25519_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0007_actor_ed25519_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="header_variants",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="actor",
+            name="icon_variants",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:05
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+
+def set_ed25519_key_ids(apps, schema_editor):
+    Actor = apps.get_model("activitypub", "Actor")
+    # Local actors publish their key under this id, and so does Mastodon. Remote
+    # actors get the id they publish the next time they're fetched.
+    Actor.objects.filter(
+        ed25519_public_key__isnull=False, actor_url__isnull=False
+    ).update(ed25519_key_id=Concat("actor_url", Value("#ed25519-key")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0008_actor_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="actor",
+            name="ed25519_key_id",
+            field=models.URLField(blank=True, max_length=1024, null=True),
+        ),
+        migrations.RunPython(set_ed25519_key_ids, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,21 @@
+import json
 import logging
+from typing import Any, Dict, Optional, Tuple
 
 import ulid
 from django.conf import settings
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F
+
+from activitypub.models.actor import Actor
+from activitypub.utils import create_digest
 
 log = logging.getLogger(__name__)
 
+# Fields of the activity document that aren't considered additional fields.
+ADDITIONAL_FIELDS_SKIPPED = {"id", "type", "actor", "object", "published", "@context"}
+
 
 class Activity(models.Model):
     actor = models.ForeignKey(
@@ -25,17 +35,41 @@ class Activity(models.Model):
     id = models.URLField(max_length=1024, primary_key=True)
     activity_type = models.CharField(max_length=50)
 
-    object_uri = models.CharField(null=True, blank=True)
-    object_json = models.JSONField(null=True, blank=True)
-    additional_fields = models.JSONField(null=True, blank=True)
-
-    context = models.JSONField(null=True, blank=True)
+    # The activity document as it was received or published, everything else
+    # (object, context, addressing, ...) is derived from it.
     raw_activity = models.JSONField(null=True, blank=True)
     is_remote = models.BooleanField(default=False)
+    # The serialized document of local activities and its digest, computed once
+    # and sent as is to every inbox and outbox page.
+    serialized = models.BinaryField(null=True, blank=True, editable=False)
+    digest = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    # Set once an incoming activity went through process_activity.
+    processed_on = models.DateTimeField(null=True, blank=True)
 
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Used for paging through the outbox.
+            models.Index(
+                fields=["actor", "-created_on", "-id"],
+                name="activity_actor_created_idx",
+            ),
+            # Used for counting active users.
+            models.Index(
+                fields=["created_on"],
+                condition=models.Q(is_remote=False),
+                name="activity_local_created_idx",
+            ),
+            # Used by the archival job to find processed remote activities.
+            models.Index(
+                fields=["processed_on"],
+                condition=models.Q(is_remote=True),
+                name="activity_remote_processed_idx",
+            ),
+        ]
+
     @staticmethod
     def create_from_json(actor, activity_data):
         activity_id = activity_data["id"]
@@ -47,30 +81,13 @@ class Activity(models.Model):
             pass
 
         log.info("Creating new activity from json with activity_id=%s", activity_id)
-        activity_object = activity_data["object"]
-        creation_kwargs = {
-            "id": activity_id,
-            "actor": actor,
-            "activity_type": activity_data.get("type"),
-            "is_remote": True,
-            "context": activity_data.get("@context"),
-            "raw_activity": activity_data,
-        }
-
-        if isinstance(activity_object, str):
-            creation_kwargs["object_uri"] = activity_object
-        else:
-            creation_kwargs["object_json"] = activity_object
-
-        skip_fields = {"id", "type", "actor", "object", "published", "@context"}
-        additional_fields = {}
-
-        for key, value in activity_data.items():
-            if key not in skip_fields and value is not None:
-                additional_fields[key] = value
-
-        creation_kwargs["additional_fields"] = additional_fields
-        return Activity.objects.create(**creation_kwargs)
+        return Activity.objects.create(
+            id=activity_id,
+            actor=actor,
+            activity_type=activity_data.get("type"),
+            is_remote=True,
+            raw_activity=activity_data,
+        )
 
     @staticmethod
     def create_from_kwargs(
@@ -82,46 +99,77 @@ class Activity(models.Model):
         activity_id = str(ulid.new())
         activity_id = f"https://{settings.SITE_URL}/activities/{activity_id}"
 
-        creation_kwargs = {}
-        additional_fields = {}
-        if isinstance(activity_object, str):
-            creation_kwargs["object_uri"] = activity_object
-        else:
-            creation_kwargs["object_json"] = activity_object
+        raw_activity = {"@context": context, "id": activity_id, "type": activity_type}
+        if actor:
+            raw_activity["actor"] = actor.actor_url
+        raw_activity["object"] = activity_object
+        raw_activity.update(kwargs)
+
+        serialized = Activity.serialize(raw_activity)
+
+        with transaction.atomic():
+            activity = Activity.objects.create(
+                id=activity_id,
+                actor=actor,
+                target=target,
+                activity_type=activity_type,
+                is_remote=False,
+                raw_activity=raw_activity,
+                serialized=serialized,
+                digest=create_digest(serialized),
+            )
+            # Local activities end up in the outbox of their actor.
+            if actor:
+                Actor.objects.filter(pk=actor.pk).update(
+                    outbox_count=F("outbox_count") + 1
+                )
+
+        return activity
 
-        for key, value in kwargs.items():
-            additional_fields[key] = value
-
-        return Activity.objects.create(
-            id=activity_id,
-            actor=actor,
-            target=target,
-            activity_type=activity_type,
-            context=context,
-            is_remote=False,
-            additional_fields=additional_fields,
-            **creation_kwargs,
-        )
-
-    def to_activity_json(self):
-        result = {
-            "@context": self.context or "https://www.w3.org/ns/activitystreams",
-            "id": self.id,
-            "type": self.activity_type,
+    @staticmethod
+    def serialize(document: Dict[str, Any]) -> bytes:
+        return json.dumps(document, cls=DjangoJSONEncoder).encode("utf-8")
+
+    def get_serialized(self) -> Tuple[bytes, str]:
+        """
+        Returns the serialized document and its digest, activities that were
+        created before they were stored are serialized and stored now.
+        """
+        if self.serialized is None or not self.digest:
+            self.serialized = Activity.serialize(self.to_activity_json())
+            self.digest = create_digest(self.serialized)
+            Activity.objects.filter(pk=self.pk).update(
+                serialized=self.serialized, digest=self.digest
+            )
+
+        # Postgres hands out memoryviews for binary fields.
+        return bytes(self.serialized), self.digest
+
+    @property
+    def context(self):
+        return (self.raw_activity or {}).get("@context")
+
+    @property
+    def object_uri(self) -> Optional[str]:
+        activity_object = (self.raw_activity or {}).get("object")
+        return activity_object if isinstance(activity_object, str) else None
+
+    @property
+    def object_json(self) -> Optional[Dict[str, Any]]:
+        activity_object = (self.raw_activity or {}).get("object")
+        return activity_object if isinstance(activity_object, dict) else None
+
+    @property
+    def additional_fields(self) -> Dict[str, Any]:
+        return {
+            key: value
+            for key, value in (self.raw_activity or {}).items()
+            if key not in ADDITIONAL_FIELDS_SKIPPED and value is not None
         }
 
-        if self.actor:
-            result["actor"] = self.actor.actor_url
-
-        # Handle object (either URI or full JSON)
-        if self.object_uri:
-            result["object"] = self.object_uri
-        elif self.object_json:
-            result["object"] = self.object_json
-
-        # Add additional fields
-        if self.additional_fields:
-            for key, value in self.additional_fields.items():
-                result[key] = value
-
+    def to_activity_json(self):
+        result = dict(self.raw_activity or {})
+        result.setdefault("@context", "https://www.w3.org/ns/activitystreams")
+        result["id"] = self.id
+        result["type"] = self.activity_type
         return result
@@ -1,10 +1,17 @@
-from typing import List
-
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.urls import reverse
 
-from activitypub.utils import generate_ulid, get_image_mimetype
+from activitypub.documents import (
+    actor_document_cache_key,
+    webfinger_document_cache_key,
+)
+from activitypub.utils import (
+    ed25519_public_key_to_multibase,
+    generate_ulid,
+    get_image_mimetype,
+)
 
 
 class Actor(models.Model):
@@ -26,9 +33,22 @@ class Actor(models.Model):
 
     public_key = models.TextField(null=True, blank=True)
     private_key = models.TextField(null=True, blank=True)
+    # Used for RFC 9421 message signatures, next to the RSA key that everyone supports.
+    ed25519_public_key = models.TextField(null=True, blank=True)
+    ed25519_private_key = models.TextField(null=True, blank=True)
+    # The id of the Ed25519 key, the keyid that message signatures made with it refer to.
+    ed25519_key_id = models.URLField(max_length=1024, null=True, blank=True)
+
+    # Denormalized so collections don't have to count on every request.
+    outbox_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     icon = models.ImageField(upload_to="icons", null=True, blank=True)
     header = models.ImageField(upload_to="headers", null=True, blank=True)
+    # Resized variants of the images, see fedletic.images.generate_variants.
+    icon_variants = models.JSONField(null=True, blank=True)
+    header_variants = models.JSONField(null=True, blank=True)
 
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
@@ -36,6 +56,92 @@ class Actor(models.Model):
     def __str__(self):
         return self.webfinger
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Rendered documents are cached until the actor changes.
+        cache.delete_many(
+            [
+                actor_document_cache_key(self.webfinger),
+                webfinger_document_cache_key(self.webfinger),
+            ]
+        )
+
+    def to_activity_json(self):
+        shared_inbox_path = reverse("shared-inbox")
+
+        document = {
+            "@context": [
+                "https://www.w3.org/ns/activitystreams",
+                "https://w3id.org/security/v1",
+                "https://w3id.org/security/multikey/v1",
+                {
+                    "toot": "https://joinmastodon.org/ns",
+                    "manuallyApprovesFollowers": "as:manuallyApprovesFollowers",
+                    "indexable": "toot:indexable",
+                },
+            ],
+            "id": self.actor_url,
+            "type": "Person",
+            "preferredUsername": self.domainless_webfinger,
+            "name": self.name,
+            "summary": self.summary,
+            "url": self.profile_url,
+            "inbox": self.inbox_url,
+            "outbox": self.outbox_url,
+            "followers": self.followers_url,
+            "following": self.following_url,
+            "published": self.created_on,
+            "publicKey": {
+                "id": self.actor_url + "#main-key",
+                "owner": self.actor_url,
+                "publicKeyPem": self.public_key,
+            },
+            "endpoints": {
+                "sharedInbox": f"https://{settings.SITE_URL}{shared_inbox_path}"
+            },
+            "icon": {
+                "type": "Image",
+                "mediaType": self.icon_mimetype,
+                "url": self.icon_uri,
+            },
+            "image": {
+                "type": "Image",
+                "mediaType": self.header_mimetype,
+                "url": self.header_uri,
+            },
+            # Mastodon Specific.
+            "indexable": False,
+            "manuallyApprovesFollowers": False,  # TODO
+        }
+
+        if self.ed25519_public_key:
+            # FEP-521a, how Ed25519 keys are published.
+            document["assertionMethod"] = [
+                {
+                    "id": self.ed25519_key_id,
+                    "type": "Multikey",
+                    "controller": self.actor_url,
+                    "publicKeyMultibase": ed25519_public_key_to_multibase(
+                        self.ed25519_public_key
+                    ),
+                }
+            ]
+
+        return document
+
+    def to_webfinger_json(self):
+        return {
+            "subject": f"acct:{self.webfinger}",
+            "aliases": [self.actor_url],
+            "links": [
+                {
+                    "rel": "self",
+                    "type": "application/activity+json",
+                    "href": self.actor_url,
+                }
+            ],
+        }
+
     @property
     def domainless_webfinger(self):
         return self.webfinger.split("@")[0]
@@ -46,23 +152,6 @@ class Actor(models.Model):
         path = reverse("frontend-profile", kwargs={"webfinger": self.webfinger})
         return f"https://{settings.SITE_URL}{path}"
 
-    @property
-    def followers_shared_inboxes(self) -> List[str]:
-        """
-        Returns the shared inboxes for followers who are on a remote server.
-        """
-        return (
-            Actor.objects.filter(
-                following__target=self,
-                following__accepted=True,
-                is_remote=True,
-                shared_inbox_url__isnull=False,
-            )
-            .exclude(shared_inbox_url="")
-            .values_list("shared_inbox_url", flat=True)
-            .distinct()
-        )
-
     @property
     def header_uri(self):
         if self.header:
@@ -1,4 +1,10 @@
-from django.db import models
+from typing import Tuple
+
+from django.db import models, transaction
+from django.db.models import F
+
+from activitypub.audience import invalidate_follower_inboxes
+from activitypub.models.actor import Actor
 
 
 class Follower(models.Model):
@@ -13,10 +19,58 @@ class Follower(models.Model):
 
     class Meta:
         unique_together = ("actor", "target")  # Prevent duplicate follows
+        indexes = [
+            # Used for paging through the followers and following collections.
+            models.Index(fields=["target", "-id"], name="follower_target_id_idx"),
+            models.Index(fields=["actor", "-id"], name="follower_actor_id_idx"),
+        ]
+
+    @staticmethod
+    def follow(actor, target) -> Tuple["Follower", bool]:
+        """
+        Creates the follow relation between actor and target, if it doesn't exist
+        yet, and updates the follower counts of both in the same transaction.
+        """
+        with transaction.atomic():
+            follower, created = Follower.objects.get_or_create(
+                actor=actor, target=target
+            )
+            if created:
+                Actor.objects.filter(pk=actor.pk).update(
+                    following_count=F("following_count") + 1
+                )
+                Actor.objects.filter(pk=target.pk).update(
+                    followers_count=F("followers_count") + 1
+                )
+
+        if created:
+            invalidate_follower_inboxes(target)
+        return follower, created
+
+    @staticmethod
+    def unfollow(actor, target) -> bool:
+        """
+        Removes the follow relation between actor and target, and updates
+        the follower counts of both in the same transaction.
+        """
+        with transaction.atomic():
+            deleted, _ = Follower.objects.filter(actor=actor, target=target).delete()
+            if deleted:
+                Actor.objects.filter(pk=actor.pk).update(
+                    following_count=F("following_count") - 1
+                )
+                Actor.objects.filter(pk=target.pk).update(
+                    followers_count=F("followers_count") - 1
+                )
+
+        if deleted:
+            invalidate_follower_inboxes(target)
+        return bool(deleted)
 
     def accept(self):
         self.accepted = True
         self.save()
+        invalidate_follower_inboxes(self.target)
 
     def __str__(self):
         return f"{self.actor} -> {self.target}"
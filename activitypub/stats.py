@@ -0,0 +1,99 @@
+import datetime
+import logging
+from typing import Dict, Optional
+
+from django.core.cache import cache
+
+from activitypub.documents import NODEINFO_DOCUMENT_CACHE_KEY
+from activitypub.events import events
+from activitypub.models.activity import Activity
+from activitypub.models.actor import Actor
+
+log = logging.getLogger(__name__)
+
+NODE_STATS_CACHE_KEY = "node-stats"
+NODE_STATS_LOCK_KEY = "node-stats:lock"
+# Seconds before another caller may queue a rollup when the first one didn't finish.
+NODE_STATS_LOCK_TIMEOUT = 5 * 60
+
+
+def _count_active_actors(since: datetime.datetime) -> int:
+    """Counts the local actors that published anything since the given moment."""
+    return (
+        Activity.objects.filter(
+            is_remote=False, actor__is_remote=False, created_on__gte=since
+        )
+        .values("actor")
+        .distinct()
+        .count()
+    )
+
+
+def collect_node_stats() -> Dict[str, int]:
+    """
+    Counts everything that is reported in NodeInfo. Apps that own content (e.g
+    workouts) contribute their counts through the node_stats event, this does
+    scan tables so it's only meant to run from the periodic rollup.
+    """
+    now = datetime.datetime.now()
+    stats = {
+        "users_total": Actor.objects.filter(is_remote=False).count(),
+        "users_active_month": _count_active_actors(now - datetime.timedelta(days=30)),
+        "users_active_halfyear": _count_active_actors(
+            now - datetime.timedelta(days=180)
+        ),
+        "local_posts": 0,
+    }
+
+    for result in events.fire(events.EVENT_NODE_STATS, collect_results=True):
+        if result:
+            stats.update(result)
+
+    return stats
+
+
+def get_provisional_node_stats() -> Dict[str, int]:
+    """
+    Returns what is reported until the first rollup is done. The number of local
+    users is a cheap count so that one is always right, the figures that need
+    table scans are reported as 0.
+    """
+    return {
+        "users_total": Actor.objects.filter(is_remote=False).count(),
+        "users_active_month": 0,
+        "users_active_halfyear": 0,
+        "local_posts": 0,
+    }
+
+
+def refresh_node_stats() -> Dict[str, int]:
+    """Rolls up the node statistics and stores them until the next rollup."""
+    try:
+        stats = collect_node_stats()
+        cache.set(NODE_STATS_CACHE_KEY, stats, timeout=None)
+    finally:
+        # Lets the next caller that finds the stats missing queue a rollup again.
+        cache.delete(NODE_STATS_LOCK_KEY)
+    # The NodeInfo document embeds the stats, so it has to be rendered again.
+    cache.delete(NODEINFO_DOCUMENT_CACHE_KEY)
+    log.debug("Refreshed node stats=%s", stats)
+    return stats
+
+
+def get_node_stats() -> Optional[Dict[str, int]]:
+    """
+    Returns the node statistics of the last rollup, or None when there hasn't
+    been a rollup yet (e.g right after a deploy). The rollup scans tables, so
+    it's never run on the spot: the first caller that finds the stats missing
+    queues it, everyone else just gets None until it's done.
+    """
+    stats = cache.get(NODE_STATS_CACHE_KEY)
+    if stats is None and cache.add(
+        NODE_STATS_LOCK_KEY, 1, timeout=NODE_STATS_LOCK_TIMEOUT
+    ):
+        # activitypub.tasks.node_stats imports this module.
+        from activitypub.tasks.node_stats import refresh_node_stats
+
+        log.debug("No node stats yet, queueing a rollup")
+        refresh_node_stats.delay()
+    return stats
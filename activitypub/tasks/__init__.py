@@ -0,0 +1,7 @@
+# Celery only autodiscovers this package, tasks that aren't imported anywhere
+# else (e.g scheduled ones) have to be imported here to get registered.
+from activitypub.tasks import (  # noqa: F401
+    archive_activities,
+    node_stats,
+    run_event_handler,
+)
@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+from celery.contrib.django.task import DjangoTask
+
+from activitypub import archive
+
+log = logging.getLogger(__name__)
+
+
+@shared_task(base=DjangoTask)
+def archive_activities():
+    archived = archive.archive_activities()
+    log.info("Archived activities archived=%s", archived)
+    return archived
@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+from celery.contrib.django.task import DjangoTask
+
+from activitypub import stats
+
+log = logging.getLogger(__name__)
+
+
+@shared_task(base=DjangoTask)
+def refresh_node_stats():
+    node_stats = stats.refresh_node_stats()
+    log.info("Refreshed node stats %s", node_stats)
+    return node_stats
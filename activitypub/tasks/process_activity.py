@@ -1,8 +1,8 @@
+import datetime
 import logging
 
 from celery import shared_task
 from celery.contrib.django.task import DjangoTask
-from django.db import IntegrityError
 
 from activitypub.events import events
 from activitypub.models.activity import Activity
@@ -14,18 +14,15 @@ from activitypub.utils import webfinger_from_url
 log = logging.getLogger(__name__)
 
 
+@events.route("Follow")
 def process_follow(activity):
     actor = activity.actor
     target = Actor.objects.get(
         webfinger=webfinger_from_url(actor_url=activity.object_uri)
     )
 
-    try:
-        Follower.objects.create(
-            actor=actor,
-            target=target,
-        )
-    except IntegrityError:
+    _, created = Follower.follow(actor=actor, target=target)
+    if not created:
         log.info(
             "Follower relation between actor=%s and target=%s already exists",
             actor,
@@ -47,6 +44,7 @@ def process_follow(activity):
     publish_activity.delay_on_commit(accept_activity.pk)
 
 
+@events.route("Undo", "Follow")
 def process_unfollow(activity):
 
     actor = activity.actor
@@ -54,39 +52,26 @@ def process_unfollow(activity):
 
     log.info("Unfollowing actor=%s target=%s", actor, target)
 
-    Follower.objects.filter(
-        actor=actor,
-        target=target,
-    ).delete()
+    Follower.unfollow(actor=actor, target=target)
 
 
+@events.route("Accept", "Follow")
 def process_accept(activity: Activity):
     target = activity.actor
     actor = Actor.objects.get(actor_url=activity.object_json["actor"])
     log.info("Following accepted. actor=%s target=%s", actor, target)
-    Follower.objects.get_or_create(actor=actor, target=target)
+    Follower.follow(actor=actor, target=target)
+    events.fire(events.EVENT_FOLLOW, actor_id=actor.pk, target_id=target.pk)
 
 
 @shared_task(base=DjangoTask)
 def process_activity(activity_id):
     """
-    This is for incoming (non-local) activities only.
+    This is for incoming (non-local) activities only, they are passed to the
+    handlers routed for their type, see EventSystem.route.
     """
-    activity = Activity.objects.get(pk=activity_id)
+    activity = Activity.objects.select_related("actor", "target").get(pk=activity_id)
 
     log.info("Processing activity=%s content=%s", activity.id, activity.raw_activity)
-
-    if activity.activity_type == "Follow":
-        process_follow(activity)
-
-    if activity.activity_type == "Accept":
-        obj_type = activity.object_json["type"]
-        if obj_type == "Follow":
-            process_accept(activity)
-
-    if activity.activity_type == "Undo":
-        obj_type = activity.object_json["type"]
-        if obj_type == "Follow":
-            process_unfollow(activity=activity)
-
-    events.fire(events.EVENT_ACTIVITY, activity_id=activity_id)
+    events.dispatch(activity)
+    Activity.objects.filter(pk=activity.pk).update(processed_on=datetime.datetime.now())
@@ -1,9 +1,9 @@
-import json
 import logging
+from urllib.parse import urlparse
 
 import httpx
 
-from activitypub.crypto import create_http_signature
+from activitypub import crypto as ap_crypto
 from activitypub.models.activity import Activity
 from fedletic.celery import app
 
@@ -12,7 +12,7 @@ log = logging.getLogger(__name__)
 
 @app.task
 def publish_activity(activity_id, inbox_url: str = None):
-    activity = Activity.objects.get(pk=activity_id)
+    activity = Activity.objects.select_related("actor", "target").get(pk=activity_id)
 
     if activity.is_remote:
         raise ValueError("Cannot send activities originating from remote")
@@ -23,31 +23,43 @@ def publish_activity(activity_id, inbox_url: str = None):
         "Accept": "application/activity+json",
     }
 
-    # Add HTTP Signature
-    activity_json = activity.to_activity_json()
-    inbox_url = activity.target.inbox_url if activity.target else inbox_url
+    # An explicit inbox wins, e.g. the shared inbox the audience was resolved to.
+    inbox_url = inbox_url or (activity.target.inbox_url if activity.target else None)
 
     if not inbox_url:
         raise ValueError("Missing inbox url")
 
+    # The document is serialized and digested once, when the activity is created.
+    encoded_body, digest = activity.get_serialized()
     log.info(
         "Ready to publish to inbox=%s content=%s",
         inbox_url,
-        activity_json,
+        encoded_body,
     )
-    encoded_body = json.dumps(activity_json).encode("utf-8")
-    signature = create_http_signature(
-        actor=activity.actor,
-        target_url=inbox_url,
-        data=encoded_body,
-    )
-    headers.update(signature)
+    host = urlparse(inbox_url).netloc
+    scheme = ap_crypto.get_signature_scheme(host)
+    if scheme == ap_crypto.SIGNATURE_SCHEME_CAVAGE:
+        response = _post(activity, inbox_url, encoded_body, digest, headers, scheme)
+    else:
+        # Hosts that aren't known to only take draft-cavage signatures get RFC 9421
+        # first, when they reject it they get a draft-cavage signature right after.
+        response = _post(
+            activity,
+            inbox_url,
+            encoded_body,
+            digest,
+            headers,
+            ap_crypto.SIGNATURE_SCHEME_RFC9421,
+        )
+        if response.status_code in (400, 401, 403):
+            log.info("Falling back to draft-cavage signatures for host=%s", host)
+            scheme = ap_crypto.SIGNATURE_SCHEME_CAVAGE
+            response = _post(activity, inbox_url, encoded_body, digest, headers, scheme)
+        else:
+            scheme = ap_crypto.SIGNATURE_SCHEME_RFC9421
 
-    response = httpx.post(
-        inbox_url,
-        content=encoded_body,  # Use the same bytes we calculated the digest on
-        headers=headers,
-    )
+        if response.status_code < 400:
+            ap_crypto.remember_signature_scheme(host, scheme)
 
     if response.status_code >= 400:
         log.error(
@@ -65,3 +77,26 @@ def publish_activity(activity_id, inbox_url: str = None):
             response.status_code,
             response.text,
         )
+
+
+def _post(activity, inbox_url, encoded_body, digest, headers, scheme):
+    if scheme == ap_crypto.SIGNATURE_SCHEME_RFC9421:
+        signature = ap_crypto.create_message_signature(
+            actor=activity.actor,
+            target_url=inbox_url,
+            data=encoded_body,
+            digest=digest,
+        )
+    else:
+        signature = ap_crypto.create_http_signature(
+            actor=activity.actor,
+            target_url=inbox_url,
+            data=encoded_body,
+            digest=digest,
+        )
+
+    return httpx.post(
+        inbox_url,
+        content=encoded_body,  # Use the same bytes we calculated the digest on
+        headers={**headers, **signature},
+    )
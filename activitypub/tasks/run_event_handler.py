@@ -0,0 +1,34 @@
+import logging
+
+from celery import shared_task
+from celery.contrib.django.task import DjangoTask
+
+from activitypub.events import events
+from activitypub.models.activity import Activity
+
+log = logging.getLogger(__name__)
+
+
+@shared_task(base=DjangoTask)
+def run_event_handler(event_name, handler_name, kwargs):
+    """Runs an event handler that was registered with the task mode."""
+    function = events.get_handler(event_name, handler_name)
+    if not function:
+        log.error(
+            "Unknown event handler event=%s function=%s", event_name, handler_name
+        )
+        return
+
+    events.run_handler(event_name, function, kwargs)
+
+
+@shared_task(base=DjangoTask)
+def run_activity_handler(activity_id, handler_name):
+    """Runs a routed activity handler that was registered with the task mode."""
+    function = events.get_route_handler(handler_name)
+    if not function:
+        log.error("Unknown activity handler function=%s", handler_name)
+        return
+
+    activity = Activity.objects.select_related("actor", "target").get(pk=activity_id)
+    events.run_handler(activity.activity_type, function, {"activity": activity})
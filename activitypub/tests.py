@@ -0,0 +1,132 @@
+import base64
+import json
+import time
+from unittest import mock
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from activitypub import crypto, stats
+from activitypub import utils as ap_utils
+from activitypub.models import Actor
+
+
+class MessageSignatureTestCase(TestCase):
+    ACTOR_URL = "https://remote.example/users/runner"
+    INBOX_URL = "https://testserver/inbox"
+
+    def setUp(self):
+        self.rsa_private_key, rsa_public_key = crypto.generate_keys(crypto.KEY_TYPE_RSA)
+        self.ed25519_private_key, ed25519_public_key = crypto.generate_keys(
+            crypto.KEY_TYPE_ED25519
+        )
+        # A remote actor that publishes both keys.
+        Actor.objects.create(
+            webfinger="runner@remote.example",
+            name="Runner",
+            is_remote=True,
+            actor_url=self.ACTOR_URL,
+            profile_url=self.ACTOR_URL,
+            public_key=rsa_public_key,
+            ed25519_public_key=ed25519_public_key,
+            ed25519_key_id=f"{self.ACTOR_URL}#multikey-1",
+        )
+        self.body = json.dumps({"type": "Like"}).encode()
+
+    def sign(self, key_type, alg=None):
+        """Signs the body like create_message_signature, alg is left out when None."""
+        if key_type == crypto.KEY_TYPE_ED25519:
+            key_id = f"{self.ACTOR_URL}#multikey-1"
+            private_key = crypto.load_private_key(self.ed25519_private_key)
+        else:
+            key_id = f"{self.ACTOR_URL}#main-key"
+            private_key = crypto.load_private_key(self.rsa_private_key)
+
+        headers = {
+            "Content-Digest": crypto._content_digest(ap_utils.create_digest(self.body))
+        }
+        components = " ".join(f'"{c}"' for c in crypto.RFC9421_COMPONENTS)
+        params_value = f'({components});created={int(time.time())};keyid="{key_id}"'
+        if alg:
+            params_value += f';alg="{alg}"'
+        signature_base = crypto._signature_base(
+            crypto.RFC9421_COMPONENTS,
+            params_value,
+            method="POST",
+            target_uri=self.INBOX_URL,
+            headers={"content-digest": headers["Content-Digest"]},
+        ).encode()
+
+        if key_type == crypto.KEY_TYPE_ED25519:
+            signature = private_key.sign(signature_base)
+        else:
+            signature = private_key.sign(
+                signature_base, padding.PKCS1v15(), hashes.SHA256()
+            )
+
+        headers["Signature-Input"] = f"sig1={params_value}"
+        headers["Signature"] = f"sig1=:{base64.b64encode(signature).decode()}:"
+        return headers
+
+    def verify(self, headers):
+        request = RequestFactory().post(
+            "/inbox",
+            data=self.body,
+            content_type="application/activity+json",
+            headers=headers,
+        )
+        return crypto.verify_message_signature(request)
+
+    def test_keyid_picks_the_key(self):
+        for key_type, alg in (
+            (crypto.KEY_TYPE_RSA, "rsa-v1_5-sha256"),
+            (crypto.KEY_TYPE_ED25519, "ed25519"),
+        ):
+            self.assertEqual(
+                self.verify(self.sign(key_type, alg)), (True, "Valid signature")
+            )
+            # alg is optional, the keyid is enough.
+            self.assertEqual(
+                self.verify(self.sign(key_type)), (True, "Valid signature")
+            )
+
+    def test_alg_has_to_match_the_key(self):
+        valid, reason = self.verify(
+            self.sign(crypto.KEY_TYPE_ED25519, alg="rsa-v1_5-sha256")
+        )
+        self.assertFalse(valid)
+        self.assertIn("does not match key", reason)
+
+    def test_picks_the_signature_it_understands(self):
+        headers = self.sign(crypto.KEY_TYPE_RSA)
+        headers["Signature-Input"] = (
+            'sig0=("@method");keyid="shared, secret";alg="hmac-sha256", '
+            + headers["Signature-Input"]
+        )
+        headers["Signature"] = "sig0=:AAAA:, " + headers["Signature"]
+        self.assertEqual(self.verify(headers), (True, "Valid signature"))
+
+
+class NodeInfoTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        Actor.objects.create(webfinger="athlete@example.com", name="Athlete")
+
+    def get_usage(self):
+        return self.client.get("/nodeinfo/2.0").json()["usage"]
+
+    @mock.patch("activitypub.tasks.node_stats.refresh_node_stats.delay")
+    def test_reports_users_before_the_first_rollup(self, delay):
+        self.assertEqual(self.get_usage()["users"]["total"], 1)
+        self.assertEqual(self.get_usage()["users"]["total"], 1)
+        delay.assert_called_once_with()
+
+        # The rollup lets the next cold cache queue a rollup again.
+        stats.refresh_node_stats()
+        self.assertIsNone(cache.get(stats.NODE_STATS_LOCK_KEY))
+        cache.delete(stats.NODE_STATS_CACHE_KEY)
+        self.get_usage()
+        self.assertEqual(delay.call_count, 2)
@@ -1,17 +1,33 @@
+import base64
+import hashlib
 import logging
+from typing import Optional
 from urllib.parse import urlparse
 
 import ulid
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
 from django.conf import settings
 
 log = logging.getLogger(__name__)
 
+# Multicodec prefix of Ed25519 public keys, as used by Multikey documents.
+ED25519_MULTICODEC_PREFIX = b"\xed\x01"
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
 
 def generate_ulid():
     """Returns a new ULID as a string."""
     return str(ulid.new()).lower()
 
 
+def create_digest(data: bytes) -> str:
+    """Returns the value of the Digest header for a request body."""
+    digest_b64 = base64.b64encode(hashlib.sha256(data).digest()).decode()
+    return f"SHA-256={digest_b64}"
+
+
 def webfinger_from_url(actor_url: str) -> str:
     parsed_url = urlparse(actor_url)
     domain = parsed_url.netloc
@@ -61,3 +77,48 @@ def get_image_mimetype(image_field):
     except Exception:
         # If anything goes wrong, return default
         return default_mime
+
+
+def _b58encode(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + encoded
+
+
+def _b58decode(value: str) -> bytes:
+    number = 0
+    for character in value:
+        number = number * 58 + BASE58_ALPHABET.index(character)
+    decoded = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(value) - len(value.lstrip("1"))) + decoded
+
+
+def ed25519_public_key_to_multibase(public_key_pem: str) -> str:
+    """Encodes an Ed25519 public key the way Multikey documents expect it."""
+    raw = load_pem_public_key(public_key_pem.encode()).public_bytes(
+        encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw
+    )
+    return "z" + _b58encode(ED25519_MULTICODEC_PREFIX + raw)
+
+
+def ed25519_public_key_from_multibase(value: str) -> Optional[str]:
+    """Returns the PEM of a multibase encoded Ed25519 public key, or None."""
+    if not value or not value.startswith("z"):
+        return None
+
+    try:
+        decoded = _b58decode(value[1:])
+    except ValueError:
+        return None
+
+    if not decoded.startswith(ED25519_MULTICODEC_PREFIX) or len(decoded) != 34:
+        return None
+
+    public_key = ed25519.Ed25519PublicKey.from_public_bytes(decoded[2:])
+    return public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode("utf-8")
@@ -1,10 +1,13 @@
 import logging
 
 from django.conf import settings
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
-from django.urls import reverse
+from django.http import Http404
 
+from activitypub.documents import (
+    actor_document_cache_key,
+    document_response,
+    get_cached_document,
+)
 from activitypub.models.actor import Actor
 from activitypub.views import ActivityPubBaseView
 
@@ -18,51 +21,13 @@ class ActorView(ActivityPubBaseView):
         webfinger = f"{username}@{settings.SITE_URL}"
         log.info("Looking up actor=%s", webfinger)
 
-        actor = get_object_or_404(Actor, webfinger=webfinger)
-        shared_inbox_path = reverse("shared-inbox")
+        def build():
+            actor = Actor.objects.filter(webfinger=webfinger).first()
+            return actor.to_activity_json() if actor else None
 
-        return JsonResponse(
-            {
-                "@context": [
-                    "https://www.w3.org/ns/activitystreams",
-                    "https://w3id.org/security/v1",
-                    {
-                        "toot": "https://joinmastodon.org/ns",
-                        "manuallyApprovesFollowers": "as:manuallyApprovesFollowers",
-                        "indexable": "toot:indexable",
-                    },
-                ],
-                "id": actor.actor_url,
-                "type": "Person",
-                "preferredUsername": actor.webfinger.split("@")[0],
-                "name": actor.name,
-                "summary": actor.summary,
-                "url": actor.profile_url,
-                "inbox": actor.inbox_url,
-                "outbox": actor.outbox_url,
-                "followers": actor.followers_url,
-                "following": actor.following_url,
-                "published": actor.created_on,
-                "publicKey": {
-                    "id": actor.actor_url + "#main-key",
-                    "owner": actor.actor_url,
-                    "publicKeyPem": actor.public_key,
-                },
-                "endpoints": {
-                    "sharedInbox": f"https://{settings.SITE_URL}{shared_inbox_path}"
-                },
-                "icon": {
-                    "type": "Image",
-                    "mediaType": actor.icon_mimetype,
-                    "url": actor.icon_uri,
-                },
-                "image": {
-                    "type": "Image",
-                    "mediaType": actor.header_mimetype,
-                    "url": actor.header_uri,
-                },
-                # Mastodon Specific.
-                "indexable": False,
-                "manuallyApprovesFollowers": False,  # TODO
-            },
-        )
+        document = get_cached_document(actor_document_cache_key(webfinger), build)
+        if not document:
+            raise Http404
+
+        body, etag = document
+        return document_response(request, body, etag, content_type=self.CONTENT_TYPE)
@@ -1,25 +1,67 @@
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 
+from activitypub.collections import ordered_collection, ordered_collection_page
 from activitypub.models.actor import Actor
 from activitypub.models.follower import Follower
 from activitypub.views import ActivityPubBaseView
 
 
-class FollowersListView(ActivityPubBaseView):
-    # TODO: Paging
+class FollowCollectionView(ActivityPubBaseView):
+    """
+    Base view for the followers and following collections, both are paged
+    on the id of the follow relation.
+    """
+
+    # The side of the follow relation the collection belongs to.
+    OWNER_FIELD = None
+    # The actor field that is listed in the collection.
+    ITEM_FIELD = None
+    COLLECTION_URL_FIELD = None
+    COUNT_FIELD = None
 
     def get(self, request, username):
         user = get_object_or_404(Actor, webfinger=f"{username}@{settings.SITE_URL}")
-        followers = Follower.objects.filter(target=user)
+        collection_id = getattr(user, self.COLLECTION_URL_FIELD)
+
+        if not request.GET.get("page"):
+            return JsonResponse(
+                ordered_collection(
+                    collection_id=collection_id,
+                    total_items=getattr(user, self.COUNT_FIELD),
+                )
+            )
+
+        follows = Follower.objects.filter(**{self.OWNER_FIELD: user}).order_by("-id")
+
+        max_id = request.GET.get("max_id")
+        if max_id:
+            try:
+                follows = follows.filter(id__lt=int(max_id))
+            except ValueError:
+                raise Http404
+
+        page_size = settings.ACTIVITYPUB_COLLECTION_PAGE_SIZE
+        rows = list(
+            follows.values_list("id", f"{self.ITEM_FIELD}__profile_url")[
+                : page_size + 1
+            ]
+        )
+        next_max_id = str(rows[page_size - 1][0]) if len(rows) > page_size else None
 
         return JsonResponse(
-            {
-                "@context": "https://www.w3.org/ns/activitystreams",
-                "id": f"https://{settings.SITE_URL}/users/{username}/followers",
-                "type": "OrderedCollection",
-                "totalItems": followers.count(),
-                "items": [follower.actor.profile_url for follower in followers],
-            }
+            ordered_collection_page(
+                collection_id=collection_id,
+                items=[profile_url for _, profile_url in rows[:page_size]],
+                max_id=max_id,
+                next_max_id=next_max_id,
+            )
         )
+
+
+class FollowersListView(FollowCollectionView):
+    OWNER_FIELD = "target"
+    ITEM_FIELD = "actor"
+    COLLECTION_URL_FIELD = "followers_url"
+    COUNT_FIELD = "followers_count"
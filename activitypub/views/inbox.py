@@ -3,6 +3,7 @@ import logging
 
 from django.http import HttpRequest, JsonResponse
 
+from activitypub.events import events
 from activitypub.models.activity import Activity
 from activitypub.models.actor import Actor
 from activitypub.tasks import process_activity
@@ -16,6 +17,24 @@ class InboxView(ActivityPubBaseView):
     # This handles both user and shared inboxes.
     def post(self, request: HttpRequest, *args, **kwargs):
         activity_data = json.loads(request.body)
+
+        # Drop whatever nothing handles before touching the database.
+        activity_object = activity_data.get("object")
+        object_type = (
+            activity_object.get("type") if isinstance(activity_object, dict) else None
+        )
+        if not events.is_routed(activity_data.get("type"), object_type):
+            log.debug(
+                "Dropping unhandled activity type=%s object_type=%s",
+                activity_data.get("type"),
+                object_type,
+            )
+            return JsonResponse(
+                {"message": "Activity received"},
+                content_type="application/activity+json",
+                status=202,
+            )
+
         username = webfinger_from_url(actor_url=activity_data.get("actor"))
 
         try:
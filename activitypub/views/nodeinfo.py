@@ -1,25 +1,49 @@
 from django.conf import settings
-from django.http import JsonResponse
 
-from activitypub.models import Actor
+from activitypub.documents import (
+    NODEINFO_DOCUMENT_CACHE_KEY,
+    document_response,
+    get_cached_document,
+    render_document,
+)
+from activitypub.stats import get_node_stats, get_provisional_node_stats
 from activitypub.views import ActivityPubBaseView
 
 
 class NodeInfoView(ActivityPubBaseView):
-    """Returns the ActivityPub actor profile for a user."""
+    """Returns the NodeInfo document, the usage figures come from the stats rollup."""
 
-    def get(self, request):
+    CONTENT_TYPE = (
+        'application/json; profile="http://nodeinfo.diaspora.software/ns/schema/2.0#"'
+    )
 
-        return JsonResponse(
-            {
-                "version": "2.0",
-                "software": {"name": "fedletic", "version": settings.VERSION},
-                "protocols": ["activitypub"],
-                "services": {"inbound": [], "outbound": []},
-                "openRegistrations": True,
-                "usage": {
-                    "users": {"total": Actor.objects.filter(is_remote=False).count()}
+    def get_document(self, node_stats):
+        return {
+            "version": "2.0",
+            "software": {"name": "fedletic", "version": settings.VERSION},
+            "protocols": ["activitypub"],
+            "services": {"inbound": [], "outbound": []},
+            "openRegistrations": True,
+            "usage": {
+                "users": {
+                    "total": node_stats["users_total"],
+                    "activeMonth": node_stats["users_active_month"],
+                    "activeHalfyear": node_stats["users_active_halfyear"],
                 },
-                "metadata": {},
-            }
-        )
+                "localPosts": node_stats["local_posts"],
+            },
+            "metadata": {},
+        }
+
+    def get(self, request):
+        def build():
+            node_stats = get_node_stats()
+            return self.get_document(node_stats) if node_stats else None
+
+        document = get_cached_document(NODEINFO_DOCUMENT_CACHE_KEY, build)
+        if document is None:
+            # The first rollup is still running, don't cache a document without all figures.
+            document = render_document(self.get_document(get_provisional_node_stats()))
+
+        body, etag = document
+        return document_response(request, body, etag, content_type=self.CONTENT_TYPE)
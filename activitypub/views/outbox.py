@@ -1,25 +1,85 @@
+import hashlib
+
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 
+from activitypub.collections import (
+    ordered_collection,
+    render_ordered_collection_page,
+)
 from activitypub.models.activity import Activity
 from activitypub.models.actor import Actor
 from activitypub.views import ActivityPubBaseView
 
 
+def _outbox_page_cache_key(actor: Actor, max_id: str = None) -> str:
+    # The outbox count is part of the key, so pages are invalidated
+    # as soon as the actor publishes something new.
+    cursor = hashlib.sha256((max_id or "").encode()).hexdigest()
+    return f"outbox-page:{actor.pk}:{actor.outbox_count}:{cursor}"
+
+
 class OutboxView(ActivityPubBaseView):
     """Returns the user's ActivityPub outbox."""
 
     def get(self, request, username):
         user = get_object_or_404(Actor, webfinger=f"{username}@{settings.SITE_URL}")
-        activities = Activity.objects.filter(actor=user).order_by("-created_on")
-
-        return JsonResponse(
-            {
-                "@context": "https://www.w3.org/ns/activitystreams",
-                "type": "OrderedCollection",
-                "totalItems": activities.count(),
-                "items": [activity.to_activity_json() for activity in activities],
-            },
-            content_type="application/activity+json",
+
+        if not request.GET.get("page"):
+            return JsonResponse(
+                ordered_collection(
+                    collection_id=user.outbox_url, total_items=user.outbox_count
+                ),
+                content_type="application/activity+json",
+            )
+
+        max_id = request.GET.get("max_id")
+        cache_key = _outbox_page_cache_key(actor=user, max_id=max_id)
+        page = cache.get(cache_key)
+
+        if page is None:
+            page = self.get_page(actor=user, max_id=max_id)
+            cache.set(
+                cache_key, page, timeout=settings.ACTIVITYPUB_COLLECTION_CACHE_TIMEOUT
+            )
+
+        return HttpResponse(page, content_type="application/activity+json")
+
+    def get_page(self, actor: Actor, max_id: str = None):
+        """
+        Returns the serialized page of the outbox that starts right after max_id,
+        pages are fetched with keyset pagination on created_on so deep pages stay
+        cheap. The items are the stored serialized activities.
+        """
+        activities = Activity.objects.filter(actor=actor).order_by("-created_on", "-id")
+
+        if max_id:
+            anchor = (
+                Activity.objects.filter(pk=max_id, actor=actor)
+                .values_list("created_on", flat=True)
+                .first()
+            )
+            if not anchor:
+                raise Http404
+            activities = activities.filter(
+                Q(created_on__lt=anchor) | Q(created_on=anchor, id__lt=max_id)
+            )
+
+        page_size = settings.ACTIVITYPUB_COLLECTION_PAGE_SIZE
+        # Only the stored serialized documents are needed.
+        activities = list(activities.defer("raw_activity")[: page_size + 1])
+        next_max_id = (
+            activities[page_size - 1].id if len(activities) > page_size else None
+        )
+
+        return render_ordered_collection_page(
+            collection_id=actor.outbox_url,
+            serialized_items=[
+                activity.get_serialized()[0] for activity in activities[:page_size]
+            ],
+            max_id=max_id,
+            next_max_id=next_max_id,
         )
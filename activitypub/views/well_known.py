@@ -1,10 +1,14 @@
 from urllib.parse import unquote
 
 from django.conf import settings
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.http import Http404, JsonResponse
 from django.urls import reverse
 
+from activitypub.documents import (
+    document_response,
+    get_cached_document,
+    webfinger_document_cache_key,
+)
 from activitypub.models.actor import Actor
 from activitypub.views import ActivityPubBaseView
 
@@ -39,18 +43,14 @@ class WellKnownWebFingerView(ActivityPubBaseView):
         # Extract the username from the resource (e.g., "acct:john@fedletic.example")
         resource = unquote(resource)
         username = resource.replace("acct:", "")
-        actor = get_object_or_404(Actor, webfinger=username)
 
-        return JsonResponse(
-            {
-                "subject": f"acct:{actor.webfinger}",
-                "aliases": [actor.actor_url],
-                "links": [
-                    {
-                        "rel": "self",
-                        "type": "application/activity+json",
-                        "href": actor.actor_url,
-                    }
-                ],
-            }
-        )
+        def build():
+            actor = Actor.objects.filter(webfinger=username).first()
+            return actor.to_webfinger_json() if actor else None
+
+        document = get_cached_document(webfinger_document_cache_key(username), build)
+        if not document:
+            raise Http404
+
+        body, etag = document
+        return document_response(request, body, etag, content_type=self.CONTENT_TYPE)
@@ -8,4 +8,7 @@ def cache_buster(request):
 
 
 def various(request):
-    return {"version": settings.VERSION}
+    return {
+        "version": settings.VERSION,
+        "workout_card_cache_timeout": settings.WORKOUT_CARD_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,446 @@
+import math
+import os
+import zlib
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps
+
+# Widths, in pixels, of the variants generated for every kind of image.
+AVATAR_VARIANT_WIDTHS = (48, 96, 192, 400)
+HEADER_VARIANT_WIDTHS = (640, 1024, 1500)
+PHOTO_VARIANT_WIDTHS = (320, 640, 1280, 1920)
+
+# Bounds of the canonical avatar and header images, see bound_image.
+AVATAR_MAX_SIZE = (400, 400)
+HEADER_MAX_SIZE = (1500, 500)
+
+# Best first, browsers pick the first format they support.
+VARIANT_FORMATS = ("AVIF", "WEBP")
+
+BLURHASH_CHARACTERS = (
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    "abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+)
+# Blurhashes are computed on a thumbnail, it's all the detail they hold.
+BLURHASH_THUMBNAIL_SIZE = 32
+
+# Metadata that remove_metadata drops from JPEG, PNG and WebP files. Segments and
+# chunks that affect how the image is decoded, and the color profile, are kept.
+JPEG_KEPT_APP_SEGMENTS = (0xE0, 0xEE)  # JFIF and Adobe.
+PNG_METADATA_CHUNKS = (b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME")
+WEBP_METADATA_CHUNKS = (b"EXIF", b"XMP ")
+WEBP_EXIF_FLAG = 0x08
+WEBP_XMP_FLAG = 0x04
+# EXIF orientations that swap the width and the height.
+TRANSPOSING_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def get_variant_formats() -> List[str]:
+    """Returns the variant formats that this Pillow build is able to write."""
+    Image.init()
+    return [
+        image_format for image_format in VARIANT_FORMATS if image_format in Image.SAVE
+    ]
+
+
+def load_image(file, min_size: Optional[int] = None) -> Image.Image:
+    """
+    Decodes file as an upright RGB(A) image. When min_size is given JPEGs are
+    decoded at the smallest scale that is still at least that large.
+    """
+    image = Image.open(file)
+    if min_size:
+        image.draft("RGB", (min_size, min_size))
+    image.load()
+
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def open_image(field_file, min_size: Optional[int] = None) -> Image.Image:
+    """Opens an image field file with load_image."""
+    with field_file.open("rb"):
+        return load_image(field_file, min_size=min_size)
+
+
+def _encode_image(image: Image.Image, image_format: str) -> bytes:
+    # Only the color profile is carried over, all other metadata is dropped.
+    options = {}
+    if icc_profile := image.info.get("icc_profile"):
+        options["icc_profile"] = icc_profile
+    if image_format == "JPEG":
+        options["quality"] = settings.IMAGE_STRIPPED_JPEG_QUALITY
+
+    output = BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def prepare_image(
+    file, name: str, max_size: Tuple[int, int], square: bool = False
+) -> ContentFile:
+    """
+    Returns a copy of an image that is upright, without metadata, center cropped
+    to a square for avatars and no larger than max_size. JPEGs are decoded at a
+    reduced scale so this stays cheap for large photos. Images with transparency
+    are stored as PNG, all others as JPEG.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    image = load_image(file, min_size=max(max_size))
+
+    if square:
+        side = min(*image.size, *max_size)
+        image = ImageOps.fit(image, (side, side), Image.LANCZOS)
+    else:
+        image.thumbnail(max_size, Image.LANCZOS)
+
+    image_format = "PNG" if image.mode == "RGBA" else "JPEG"
+    root, _ = os.path.splitext(os.path.basename(name))
+    return ContentFile(
+        _encode_image(image, image_format), name=f"{root}.{image_format.lower()}"
+    )
+
+
+def _jpeg_segment(marker: int, data: bytes) -> bytes:
+    return bytes((0xFF, marker)) + (len(data) + 2).to_bytes(2, "big") + data
+
+
+def _remove_jpeg_metadata(data: bytes, exif: Optional[bytes]) -> bytes:
+    output = bytearray(data[:2])
+    position = 2
+    while position < len(data):
+        if data[position] != 0xFF:
+            raise ValueError("Invalid JPEG marker")
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte.
+            position += 1
+            continue
+
+        # The orientation goes right after the JFIF segment, where EXIF belongs.
+        if exif and marker != 0xE0:
+            output += _jpeg_segment(0xE1, exif)
+            exif = None
+
+        if marker == 0xDA:
+            # Start of scan, the compressed image data follows.
+            output += data[position:]
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            output += data[position : position + 2]
+            position += 2
+            continue
+
+        length = int.from_bytes(data[position + 2 : position + 4], "big")
+        segment = data[position : position + 2 + length]
+        position += 2 + length
+
+        is_metadata = marker == 0xFE or (
+            0xE0 <= marker <= 0xEF and marker not in JPEG_KEPT_APP_SEGMENTS
+        )
+        is_color_profile = marker == 0xE2 and segment[4:16] == b"ICC_PROFILE\0"
+        if not is_metadata or is_color_profile:
+            output += segment
+
+    return bytes(output)
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        len(data).to_bytes(4, "big")
+        + chunk_type
+        + data
+        + zlib.crc32(chunk_type + data).to_bytes(4, "big")
+    )
+
+
+def _remove_png_metadata(data: bytes, exif: Optional[bytes]) -> bytes:
+    output = bytearray(data[:8])
+    position = 8
+    while position < len(data):
+        length = int.from_bytes(data[position : position + 4], "big")
+        chunk_type = data[position + 4 : position + 8]
+        chunk = data[position : position + 12 + length]
+        position += 12 + length
+
+        if exif and chunk_type == b"IDAT":
+            # eXIf holds the TIFF structure only, and has to come before the image data.
+            output += _png_chunk(b"eXIf", exif[6:])
+            exif = None
+        if chunk_type not in PNG_METADATA_CHUNKS:
+            output += chunk
+
+    return bytes(output)
+
+
+def _remove_webp_metadata(data: bytes, exif: Optional[bytes]) -> bytes:
+    chunks = []
+    position = 12
+    while position + 8 <= len(data):
+        fourcc = data[position : position + 4]
+        size = int.from_bytes(data[position + 4 : position + 8], "little")
+        # Chunks are padded to an even size.
+        chunk = data[position : position + 8 + size + size % 2]
+        position += 8 + size + size % 2
+        if fourcc not in WEBP_METADATA_CHUNKS:
+            chunks.append(chunk)
+
+    # Only the extended format (VP8X) has metadata, and flags what it has.
+    if chunks and chunks[0][:4] == b"VP8X":
+        header = bytearray(chunks[0])
+        header[8] &= ~(WEBP_EXIF_FLAG | WEBP_XMP_FLAG) & 0xFF
+        if exif:
+            header[8] |= WEBP_EXIF_FLAG
+            exif = exif[6:]
+            chunks.append(
+                b"EXIF"
+                + len(exif).to_bytes(4, "little")
+                + exif
+                + b"\0" * (len(exif) % 2)
+            )
+        chunks[0] = bytes(header)
+
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + len(body).to_bytes(4, "little") + body
+
+
+def remove_metadata(file, name: str) -> ContentFile:
+    """
+    Returns a copy of an uploaded or downloaded image without its metadata, EXIF
+    data may hold the location and the camera a photo was taken with. JPEG, PNG
+    and WebP files are rewritten without decoding them, so this is cheap enough
+    to run while the upload request waits: metadata segments are dropped, the
+    color profile is kept and the orientation is carried over in an EXIF block
+    of its own. Other formats are rare, those are decoded and encoded again.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    data = file.read()
+    image = Image.open(BytesIO(data))
+
+    exif = None
+    orientation = image.getexif().get(ExifTags.Base.Orientation)
+    if orientation and orientation != 1:
+        orientation_exif = Image.Exif()
+        orientation_exif[ExifTags.Base.Orientation] = orientation
+        exif = orientation_exif.tobytes()
+
+    name = os.path.basename(name)
+    if image.format == "JPEG":
+        content = _remove_jpeg_metadata(data, exif)
+    elif image.format == "PNG":
+        content = _remove_png_metadata(data, exif)
+    elif image.format == "WEBP":
+        content = _remove_webp_metadata(data, exif)
+    else:
+        image = load_image(BytesIO(data))
+        image_format = "PNG" if image.mode == "RGBA" else "JPEG"
+        content = _encode_image(image, image_format)
+        name = f"{os.path.splitext(name)[0]}.{image_format.lower()}"
+
+    return ContentFile(content, name=name)
+
+
+def bound_image(
+    field_file, max_size: Tuple[int, int], square: bool = False
+) -> Optional[str]:
+    """
+    Makes the image in field_file fit the bounds of the canonical avatar or
+    header image, see prepare_image. The bounded copy is stored next to the
+    original, which is left alone.
+
+    Returns the name of the copy, or None when the image fits already.
+    """
+    with field_file.open("rb"):
+        image = Image.open(field_file)
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSING_ORIENTATIONS:
+            width, height = height, width
+
+        if width <= max_size[0] and height <= max_size[1]:
+            if not square or width == height:
+                return None
+
+        content = prepare_image(field_file, field_file.name, max_size, square=square)
+
+    directory = os.path.dirname(field_file.name)
+    return field_file.storage.save(os.path.join(directory, content.name), content)
+
+
+def _encode_base83(value: int, length: int) -> str:
+    return "".join(
+        BLURHASH_CHARACTERS[value // 83 ** (length - i - 1) % 83] for i in range(length)
+    )
+
+
+def _srgb_to_linear(value: int) -> float:
+    value = value / 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _quantise_ac(value: float) -> int:
+    return max(
+        0, min(18, math.floor(math.copysign(abs(value) ** 0.5, value) * 9 + 9.5))
+    )
+
+
+def encode_blurhash(
+    image: Image.Image, x_components: int = 4, y_components: int = 3
+) -> str:
+    """
+    Encodes image as a blurhash (https://blurha.sh), a short string that clients
+    decode into a blurred placeholder while the image itself loads.
+    """
+    thumbnail = image.convert("RGB")
+    thumbnail.thumbnail((BLURHASH_THUMBNAIL_SIZE, BLURHASH_THUMBNAIL_SIZE))
+    width, height = thumbnail.size
+    linear = [tuple(map(_srgb_to_linear, pixel)) for pixel in thumbnail.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pixel = linear[row + x]
+                    r += basis * pixel[0]
+                    g += basis * pixel[1]
+                    b += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = _encode_base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max = 0
+        max_value = 1
+    blurhash += _encode_base83(quantised_max, 1)
+
+    r, g, b = (_linear_to_srgb(value) for value in dc)
+    blurhash += _encode_base83((r << 16) + (g << 8) + b, 4)
+
+    for factor in ac:
+        r, g, b = (_quantise_ac(value / max_value) for value in factor)
+        blurhash += _encode_base83(r * 19 * 19 + g * 19 + b, 2)
+
+    return blurhash
+
+
+def get_average_color(image: Image.Image) -> str:
+    """Returns the average color of image as a CSS hex color."""
+    r, g, b = image.convert("RGB").resize((1, 1), Image.BOX).getpixel((0, 0))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def generate_variants(
+    field_file, widths: Sequence[int], square: bool = False
+) -> Dict[str, Any]:
+    """
+    Writes resized copies of the image in field_file next to the original, one
+    per width and variant format. Widths larger than the image are capped at its
+    own width, and avatars (square) are center cropped first.
+
+    Returns the metadata to store with the image: its dimensions, blurhash,
+    average color and the variants that were written.
+    """
+    image = open_image(field_file, min_size=max(widths))
+    if square:
+        side = min(image.size)
+        image = ImageOps.fit(image, (side, side))
+
+    storage = field_file.storage
+    root, _ = os.path.splitext(field_file.name)
+    variants = []
+
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+
+        for image_format in get_variant_formats():
+            extension = image_format.lower()
+            output = BytesIO()
+            resized.save(
+                output, format=image_format, quality=settings.IMAGE_VARIANT_QUALITY
+            )
+            name = storage.save(
+                f"{root}_{width}w.{extension}", ContentFile(output.getvalue())
+            )
+            variants.append(
+                {"format": extension, "width": width, "height": height, "name": name}
+            )
+
+    return {
+        "width": image.width,
+        "height": image.height,
+        "blurhash": encode_blurhash(image),
+        "color": get_average_color(image),
+        "variants": variants,
+    }
+
+
+def strip_metadata(field_file) -> str:
+    """
+    Rewrites the image in field_file without its metadata, EXIF data may hold
+    the location and the camera a photo was taken with. The EXIF orientation is
+    applied to the pixels first so the image stays upright. The rewritten image
+    replaces the original.
+
+    Returns the name of the rewritten file.
+    """
+    with field_file.open("rb"):
+        image = Image.open(field_file)
+        image_format = image.format
+        image.load()
+
+    content = _encode_image(ImageOps.exif_transpose(image), image_format)
+
+    storage = field_file.storage
+    name = storage.save(field_file.name, ContentFile(content))
+    # Storages that overwrite files keep the name.
+    if name != field_file.name:
+        storage.delete(field_file.name)
+    return name
+
+
+def delete_variants(storage, metadata: Optional[Dict[str, Any]]):
+    """Deletes the variant files described by metadata from storage."""
+    for variant in (metadata or {}).get("variants", []):
+        storage.delete(variant["name"])
+
+
+def clear_variants(instance, field_name: str):
+    """
+    Deletes the variants of the image in field_name, e.g. because the image is
+    about to be replaced. The instance still needs to be saved.
+    """
+    variants_field = f"{field_name}_variants"
+    delete_variants(
+        getattr(instance, field_name).storage, getattr(instance, variants_field)
+    )
+    setattr(instance, variants_field, None)
@@ -1,9 +1,8 @@
 import logging
 
 from django.core.management.base import BaseCommand
-from django.db.transaction import atomic
 
-from workouts.models import Workout
+from workouts.methods import recount_counters
 
 log = logging.getLogger(__name__)
 
@@ -11,21 +10,21 @@ log = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Recount all likes and comments on all workouts"
 
-    @atomic
-    def check_workout(self, workout):
-        self.stdout.write(f"recounting likes and comments for workout {workout.pk}")
-        workout.like_count = workout.likes.count()
-        workout.comment_count = workout.comments.count()
-        workout.save()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Number of workout ids recounted per statement",
+        )
 
-    def handle(self, *args, **options):
-        # Command implementation goes here
+    def handle(self, *args, chunk_size=None, **options):
         self.stdout.write("Recounting all likes and comments for all workouts.")
 
-        for workout in Workout.objects.all():
-            self.check_workout(workout)
+        stats = recount_counters(chunk_size=chunk_size)
 
-        # Example success message:
+        self.stdout.write(
+            f"drifted={stats['drifted']} like_drift={stats['like_drift']} comment_drift={stats['comment_drift']}"
+        )
         self.stdout.write(
             self.style.SUCCESS("Recounted all likes and comments for all workouts.")
         )
@@ -99,6 +99,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Redis is shared with celery, the key prefix keeps our keys apart.
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_DB = os.environ.get("REDIS_DB", "0")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:6379/{REDIS_DB}",
+        "KEY_PREFIX": "fedletic",
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -206,3 +222,117 @@ EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "true").lower() == "true"
 
 # Post & Comment settings
 MAX_POST_CHARACTERS = os.environ.get("MAX_POST_CHARACTERS", 500)
+
+# ActivityPub settings
+# Collections such as the outbox are served in pages of this size,
+# rendered pages are cached for ACTIVITYPUB_COLLECTION_CACHE_TIMEOUT seconds.
+ACTIVITYPUB_COLLECTION_PAGE_SIZE = int(
+    os.environ.get("ACTIVITYPUB_COLLECTION_PAGE_SIZE", 20)
+)
+ACTIVITYPUB_COLLECTION_CACHE_TIMEOUT = int(
+    os.environ.get("ACTIVITYPUB_COLLECTION_CACHE_TIMEOUT", 60 * 60)
+)
+# Actor and WebFinger documents may be cached by remote servers for this many seconds.
+ACTIVITYPUB_DOCUMENT_MAX_AGE = int(
+    os.environ.get("ACTIVITYPUB_DOCUMENT_MAX_AGE", 5 * 60)
+)
+# The inboxes that reach the followers of an actor are cached until the follower set
+# changes, the timeout catches remote followers that moved their inbox.
+ACTIVITYPUB_AUDIENCE_CACHE_TIMEOUT = int(
+    os.environ.get("ACTIVITYPUB_AUDIENCE_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+# Remote objects are fetched with these timeouts (seconds) over a shared connection
+# pool, responses are cached for ACTIVITYPUB_FETCH_CACHE_TIMEOUT seconds.
+ACTIVITYPUB_FETCH_TIMEOUT = int(os.environ.get("ACTIVITYPUB_FETCH_TIMEOUT", 10))
+ACTIVITYPUB_FETCH_CONNECT_TIMEOUT = int(
+    os.environ.get("ACTIVITYPUB_FETCH_CONNECT_TIMEOUT", 5)
+)
+ACTIVITYPUB_FETCH_MAX_CONNECTIONS = int(
+    os.environ.get("ACTIVITYPUB_FETCH_MAX_CONNECTIONS", 20)
+)
+ACTIVITYPUB_FETCH_CACHE_TIMEOUT = int(
+    os.environ.get("ACTIVITYPUB_FETCH_CACHE_TIMEOUT", 60 * 60)
+)
+# Size of the thread pool that runs event handlers registered with the thread mode.
+ACTIVITYPUB_EVENT_THREADS = int(os.environ.get("ACTIVITYPUB_EVENT_THREADS", 4))
+# RFC 9421 signatures older than this many seconds are rejected. Which signature scheme
+# a remote host accepts is remembered for ACTIVITYPUB_SIGNATURE_SCHEME_CACHE_TIMEOUT seconds.
+ACTIVITYPUB_SIGNATURE_MAX_AGE = int(
+    os.environ.get("ACTIVITYPUB_SIGNATURE_MAX_AGE", 60 * 60)
+)
+ACTIVITYPUB_SIGNATURE_SCHEME_CACHE_TIMEOUT = int(
+    os.environ.get("ACTIVITYPUB_SIGNATURE_SCHEME_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+)
+# Remote activities are moved to the archive once they have been processed this many days
+# ago, in gzipped JSON lines files of ACTIVITYPUB_ARCHIVE_BATCH_SIZE activities.
+ACTIVITYPUB_ARCHIVE_AFTER_DAYS = int(
+    os.environ.get("ACTIVITYPUB_ARCHIVE_AFTER_DAYS", 30)
+)
+ACTIVITYPUB_ARCHIVE_BATCH_SIZE = int(
+    os.environ.get("ACTIVITYPUB_ARCHIVE_BATCH_SIZE", 1000)
+)
+ACTIVITYPUB_ARCHIVE_ROOT = os.environ.get(
+    "ACTIVITYPUB_ARCHIVE_ROOT", str(BASE_DIR / "archive")
+)
+
+# Feed settings
+# Feed items are only kept for the newest FEED_RETENTION_MAX_ITEMS items or FEED_RETENTION_DAYS days
+# per user, whichever is smaller. Anything older is served directly from the workouts table.
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", 20))
+FEED_RETENTION_MAX_ITEMS = int(os.environ.get("FEED_RETENTION_MAX_ITEMS", 500))
+FEED_RETENTION_DAYS = int(os.environ.get("FEED_RETENTION_DAYS", 90))
+# Number of workouts copied into a feed when following someone.
+FEED_BACKFILL_LIMIT = int(os.environ.get("FEED_BACKFILL_LIMIT", 50))
+# Feed items are inserted and deleted in batches of this size to keep locks short.
+FEED_BATCH_SIZE = int(os.environ.get("FEED_BATCH_SIZE", 1000))
+
+# The public timeline shown to anonymous visitors keeps the newest PUBLIC_TIMELINE_MAX_ITEMS items,
+# and may be cached by browsers and proxies for PUBLIC_TIMELINE_MAX_AGE seconds.
+PUBLIC_TIMELINE_MAX_ITEMS = int(os.environ.get("PUBLIC_TIMELINE_MAX_ITEMS", 500))
+PUBLIC_TIMELINE_MAX_AGE = int(os.environ.get("PUBLIC_TIMELINE_MAX_AGE", 60))
+
+# Quality, 0-100, of the resized WebP/AVIF variants generated for uploaded and remote images.
+IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+# JPEG quality used when photos are rewritten to strip their EXIF metadata.
+IMAGE_STRIPPED_JPEG_QUALITY = int(os.environ.get("IMAGE_STRIPPED_JPEG_QUALITY", 92))
+
+# Workout settings
+# Like and comment counter changes are folded into the workouts every WORKOUT_COUNTER_FLUSH_INTERVAL
+# seconds, WORKOUT_COUNTER_BATCH_SIZE changes per update.
+WORKOUT_COUNTER_FLUSH_INTERVAL = int(
+    os.environ.get("WORKOUT_COUNTER_FLUSH_INTERVAL", 10)
+)
+WORKOUT_COUNTER_BATCH_SIZE = int(os.environ.get("WORKOUT_COUNTER_BATCH_SIZE", 1000))
+# Rendered workout cards are cached for this many seconds, their cache key changes whenever
+# the workout, its actor or its counters change.
+WORKOUT_CARD_CACHE_TIMEOUT = int(
+    os.environ.get("WORKOUT_CARD_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+# Number of workout ids that recount_likes_and_comments reconciles per statement.
+WORKOUT_RECOUNT_CHUNK_SIZE = int(os.environ.get("WORKOUT_RECOUNT_CHUNK_SIZE", 50000))
+# Deliveries of a remote workout that find another delivery importing it check back after
+# WORKOUT_IMPORT_RETRY_DELAY seconds, at most WORKOUT_IMPORT_MAX_RETRIES times.
+WORKOUT_IMPORT_RETRY_DELAY = int(os.environ.get("WORKOUT_IMPORT_RETRY_DELAY", 30))
+WORKOUT_IMPORT_MAX_RETRIES = int(os.environ.get("WORKOUT_IMPORT_MAX_RETRIES", 5))
+# Number of image attachments that process_image_attachments queues per batch.
+WORKOUT_IMAGE_BATCH_SIZE = int(os.environ.get("WORKOUT_IMAGE_BATCH_SIZE", 500))
+
+# Periodic tasks, run these with `celery -A fedletic beat`.
+CELERY_BEAT_SCHEDULE = {
+    "prune-feeds": {
+        "task": "feeds.tasks.prune_feeds",
+        "schedule": 60 * 60,  # Hourly.
+    },
+    "refresh-node-stats": {
+        "task": "activitypub.tasks.node_stats.refresh_node_stats",
+        "schedule": 60 * 60,  # Hourly.
+    },
+    "archive-activities": {
+        "task": "activitypub.tasks.archive_activities.archive_activities",
+        "schedule": 24 * 60 * 60,  # Daily.
+    },
+    "flush-workout-counters": {
+        "task": "workouts.tasks.flush_counter_deltas",
+        "schedule": WORKOUT_COUNTER_FLUSH_INTERVAL,
+    },
+}
@@ -0,0 +1,71 @@
+import logging
+
+from django.apps import apps
+
+from fedletic import images
+from fedletic.celery import app
+
+log = logging.getLogger(__name__)
+
+
+@app.task()
+def generate_image_variants(
+    model_label, pk, field_name, widths, square=False, max_size=None
+):
+    """
+    Generates the responsive variants of the image in field_name and stores
+    their metadata in the <field_name>_variants field of the same model. With
+    max_size the image itself is replaced by a copy that fits those bounds
+    first, see fedletic.images.bound_image.
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if not instance or not getattr(instance, field_name):
+        log.debug("Nothing to generate for %s pk=%s", model_label, pk)
+        return
+
+    field_file = getattr(instance, field_name)
+    original_name = field_file.name
+    bounded_name = None
+    if max_size:
+        bounded_name = images.bound_image(field_file, max_size, square=square)
+        if bounded_name:
+            field_file = type(field_file)(instance, field_file.field, bounded_name)
+
+    variants = images.generate_variants(field_file, widths, square=square)
+
+    # The image may have been replaced while the variants were generated.
+    instance.refresh_from_db()
+    if getattr(instance, field_name).name != original_name:
+        images.delete_variants(field_file.storage, variants)
+        if bounded_name:
+            field_file.storage.delete(bounded_name)
+        return
+
+    update_fields = []
+    if bounded_name:
+        setattr(instance, field_name, bounded_name)
+        update_fields.append(field_name)
+
+    variants_field = f"{field_name}_variants"
+    images.delete_variants(field_file.storage, getattr(instance, variants_field))
+    setattr(instance, variants_field, variants)
+    # Also bump auto_now fields, those are part of the cache keys of rendered pages.
+    instance.save(
+        update_fields=update_fields
+        + [variants_field]
+        + [
+            field.name
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+    )
+    if bounded_name:
+        field_file.storage.delete(original_name)
+    log.info(
+        "Generated variants=%s for %s pk=%s field=%s",
+        len(variants["variants"]),
+        model_label,
+        pk,
+        field_name,
+    )
@@ -0,0 +1,12 @@
+from activitypub.events import events
+from feeds import tasks as feed_tasks
+
+
+@events.on(events.EVENT_FOLLOW)
+def backfill_followed_actor(actor_id, target_id):
+    feed_tasks.backfill_feed.delay_on_commit(actor_id=actor_id, source_id=target_id)
+
+
+@events.on(events.EVENT_UNFOLLOW)
+def purge_unfollowed_actor(actor_id, target_id):
+    feed_tasks.purge_feed.delay_on_commit(actor_id=actor_id, source_id=target_id)
@@ -1,9 +1,18 @@
 import datetime
 import logging
+from typing import Dict, List, Tuple
 
-from activitypub.models import Actor
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Count, Max, Q
 
-from .models import FeedItem
+from activitypub.models import Actor, Follower
+from workouts.consts import WORKOUT_STATUS_FINISHED
+from workouts.methods import get_workouts_version, merge_pending_counts
+from workouts.models import Workout
+
+from .models import FeedItem, PublicTimelineItem
 
 log = logging.getLogger(__name__)
 
@@ -44,3 +53,291 @@ def distribute_to_feed(source: Actor, content_object):
             content_object=content_object,
             published_on=published_on,
         )
+        # And in the public timeline, local content is always public (for now).
+        PublicTimelineItem.objects.create(
+            source=source,
+            content_object=content_object,
+            published_on=published_on,
+        )
+
+
+def _after_cursor(time_field: str, id_field: str, before, before_id=None) -> Q:
+    """
+    Matches the items that come after the (before, before_id) cursor when the
+    items are ordered by time_field and then id_field, both descending. Items
+    that share the timestamp of the cursor are told apart by their id.
+    """
+    after = Q(**{f"{time_field}__lt": before})
+    if before_id is not None:
+        after |= Q(**{time_field: before, f"{id_field}__lt": before_id})
+    return after
+
+
+def get_feed(
+    target: Actor,
+    before: datetime.datetime = None,
+    before_id: int = None,
+    limit: int = None,
+) -> List[FeedItem]:
+    """
+    Returns a page of feed items for target, newest first. Pages are keyset
+    paginated on (published_on, object_id), pass those of the last item of a
+    page as before and before_id to get the next one.
+
+    Feed items are pruned after a while (see prune_feeds), so once the retained
+    items run out the page is topped up with workouts from the actors that the
+    target follows, straight from the workouts table. Those are returned as
+    unsaved feed items so the templates don't have to care where they came from.
+    The cursor uses the id of the workout rather than that of the feed item, so
+    it means the same for both.
+    """
+    limit = limit or settings.FEED_PAGE_SIZE
+
+    feed_items = FeedItem.objects.filter(target=target)
+    if before:
+        feed_items = feed_items.filter(
+            _after_cursor("published_on", "object_id", before, before_id)
+        )
+    feed_items = feed_items.order_by("-published_on", "-object_id")
+    feed_items = list(feed_items.prefetch_related("content_object__actor")[:limit])
+
+    if len(feed_items) == limit:
+        merge_pending_counts(feed_item.content_object for feed_item in feed_items)
+        return feed_items
+
+    if feed_items:
+        before = feed_items[-1].published_on
+        before_id = feed_items[-1].object_id
+
+    followed = Follower.objects.filter(actor=target, accepted=True).values("target")
+    workouts = Workout.objects.filter(
+        Q(actor__in=followed) | Q(actor=target), status=WORKOUT_STATUS_FINISHED
+    )
+    if before:
+        workouts = workouts.filter(_after_cursor("created_on", "id", before, before_id))
+    workouts = workouts.select_related("actor").order_by("-created_on", "-id")
+
+    for workout in workouts[: limit - len(feed_items)]:
+        feed_items.append(
+            FeedItem(
+                source=workout.actor,
+                target=target,
+                content_object=workout,
+                published_on=workout.created_on,
+            )
+        )
+
+    merge_pending_counts(feed_item.content_object for feed_item in feed_items)
+    return feed_items
+
+
+def get_public_timeline(
+    before: datetime.datetime = None, before_id: int = None, limit: int = None
+) -> List[PublicTimelineItem]:
+    """
+    Returns a page of the public timeline, newest first. Keyset paginated on
+    (published_on, object_id) like get_feed.
+    """
+    limit = limit or settings.FEED_PAGE_SIZE
+
+    timeline_items = PublicTimelineItem.objects.all()
+    if before:
+        timeline_items = timeline_items.filter(
+            _after_cursor("published_on", "object_id", before, before_id)
+        )
+    timeline_items = timeline_items.order_by("-published_on", "-object_id")
+    timeline_items = list(
+        timeline_items.prefetch_related("content_object__actor")[:limit]
+    )
+    merge_pending_counts(
+        timeline_item.content_object for timeline_item in timeline_items
+    )
+    return timeline_items
+
+
+def get_feed_version(target: Actor) -> Tuple:
+    """
+    Returns the version of the feed of target: of its feed items and of every
+    workout that get_feed may show, including those it tops pages up with. It's
+    cheap enough to check before a page of the feed is loaded.
+    """
+    feed_items = FeedItem.objects.filter(target=target).order_by()
+    followed = Follower.objects.filter(actor=target, accepted=True).values("target")
+    workouts = Workout.objects.filter(
+        Q(pk__in=feed_items.values("object_id"))
+        | Q(actor__in=followed)
+        | Q(actor=target)
+    )
+    return (
+        tuple(feed_items.aggregate(latest=Max("id"), count=Count("id")).values()),
+        get_workouts_version(workouts),
+    )
+
+
+def get_public_timeline_version() -> Tuple:
+    """Returns the version of the public timeline, like get_feed_version."""
+    timeline_items = PublicTimelineItem.objects.order_by()
+    workouts = Workout.objects.filter(pk__in=timeline_items.values("object_id"))
+    return (
+        tuple(timeline_items.aggregate(latest=Max("id"), count=Count("id")).values()),
+        get_workouts_version(workouts),
+    )
+
+
+def backfill_feed(
+    target: Actor, source: Actor, limit: int = None, batch_size: int = None
+) -> int:
+    """
+    Copies the most recent workouts of source into the feed of target, so that
+    following someone immediately shows some of their history.
+
+    Returns the number of feed items that were added.
+    """
+    limit = limit or settings.FEED_BACKFILL_LIMIT
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+
+    content_type = ContentType.objects.get_for_model(Workout)
+    existing = set(
+        FeedItem.objects.filter(
+            target=target, source=source, content_type=content_type
+        ).values_list("object_id", flat=True)
+    )
+    workouts = (
+        Workout.objects.filter(actor=source, status=WORKOUT_STATUS_FINISHED)
+        .order_by("-created_on", "-id")
+        .values_list("id", "created_on")[:limit]
+    )
+
+    feed_items = [
+        FeedItem(
+            source=source,
+            target=target,
+            content_type=content_type,
+            object_id=workout_id,
+            published_on=created_on,
+        )
+        for workout_id, created_on in workouts
+        if workout_id not in existing
+    ]
+
+    # Every batch is inserted in its own transaction.
+    for start in range(0, len(feed_items), batch_size):
+        FeedItem.objects.bulk_create(feed_items[start : start + batch_size])
+
+    return len(feed_items)
+
+
+def remove_from_feed(target: Actor, source: Actor, batch_size: int = None) -> int:
+    """
+    Removes everything source distributed to the feed of target, e.g after target
+    stopped following source.
+
+    Returns the number of feed items that were removed.
+    """
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+    return _delete_in_batches(
+        FeedItem.objects.filter(target=target, source=source), batch_size
+    )
+
+
+def _delete_in_batches(items, batch_size: int) -> int:
+    """
+    Deletes the given items a batch at a time, every batch runs in its own
+    short transaction so pruning never holds locks on the feed tables for long.
+    """
+    removed = 0
+    while True:
+        batch = list(items.order_by().values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return removed
+
+        deleted, _ = items.model.objects.filter(pk__in=batch).delete()
+        removed += deleted
+
+
+def prune_feeds(
+    max_items: int = None, max_age_days: int = None, batch_size: int = None
+) -> int:
+    """
+    Applies the feed retention policy: every target keeps at most max_items feed
+    items, none of which are older than max_age_days. Feeds are pruned one
+    target at a time, so every query uses the (target, published_on) index
+    instead of scanning the whole table. Only local actors have feeds, see
+    distribute_to_feed.
+
+    Returns the number of feed items that were removed.
+    """
+    max_items = max_items or settings.FEED_RETENTION_MAX_ITEMS
+    max_age_days = max_age_days or settings.FEED_RETENTION_DAYS
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+    targets = Actor.objects.filter(is_remote=False).values_list("pk", flat=True)
+    removed = 0
+
+    for target_id in targets.iterator():
+        feed_items = FeedItem.objects.filter(target_id=target_id)
+        target_removed = _delete_in_batches(
+            feed_items.filter(published_on__lt=cutoff), batch_size
+        )
+
+        boundary = feed_items.order_by("-published_on", "-id").values_list(
+            "published_on", flat=True
+        )[max_items - 1 : max_items]
+        if boundary:
+            target_removed += _delete_in_batches(
+                feed_items.filter(published_on__lt=boundary[0]), batch_size
+            )
+
+        if target_removed:
+            log.debug("Pruned %s feed items for target=%s", target_removed, target_id)
+        removed += target_removed
+
+    return removed
+
+
+def prune_public_timeline(max_items: int = None, batch_size: int = None) -> int:
+    """
+    Trims the public timeline down to its newest max_items items.
+
+    Returns the number of timeline items that were removed.
+    """
+    max_items = max_items or settings.PUBLIC_TIMELINE_MAX_ITEMS
+    batch_size = batch_size or settings.FEED_BATCH_SIZE
+
+    boundary = PublicTimelineItem.objects.order_by("-published_on", "-id").values_list(
+        "published_on", flat=True
+    )[max_items - 1 : max_items]
+    if not boundary:
+        return 0
+
+    return _delete_in_batches(
+        PublicTimelineItem.objects.filter(published_on__lt=boundary[0]), batch_size
+    )
+
+
+def get_feed_table_stats() -> Dict[str, int]:
+    """Returns the on-disk size and the dead tuple count of the feed table."""
+    table = FeedItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_total_relation_size(%s), pg_indexes_size(%s), "
+            "COALESCE((SELECT n_dead_tup FROM pg_stat_user_tables WHERE relname = %s), 0)",
+            [table, table, table],
+        )
+        total_size, index_size, dead_tuples = cursor.fetchone()
+
+    return {
+        "total_size": total_size,
+        "index_size": index_size,
+        "dead_tuples": dead_tuples,
+    }
+
+
+def vacuum_feed_table():
+    """
+    Marks the space of pruned feed items as reusable so the table and its indexes
+    stop growing. This is a plain VACUUM, it does not take an exclusive lock.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"VACUUM (ANALYZE) {FeedItem._meta.db_table}")
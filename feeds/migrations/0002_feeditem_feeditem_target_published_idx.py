@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0001_initial"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("feeds", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="feeditem",
+            index=models.Index(
+                fields=["target", "-published_on"], name="feeditem_target_published_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_public_timeline(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    PublicTimelineItem = apps.get_model("feeds", "PublicTimelineItem")
+    Workout = apps.get_model("workouts", "Workout")
+
+    workouts = (
+        Workout.objects.filter(actor__is_remote=False, status="finished")
+        .order_by("-created_on")
+        .values_list("id", "actor_id", "created_on")[
+            : settings.PUBLIC_TIMELINE_MAX_ITEMS
+        ]
+    )
+    if not workouts:
+        return
+
+    content_type, _ = ContentType.objects.get_or_create(
+        app_label="workouts", model="workout"
+    )
+    PublicTimelineItem.objects.bulk_create(
+        PublicTimelineItem(
+            source_id=actor_id,
+            content_type=content_type,
+            object_id=workout_id,
+            published_on=created_on,
+        )
+        for workout_id, actor_id, created_on in workouts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activitypub", "0001_initial"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("feeds", "0002_feeditem_feeditem_target_published_idx"),
+        ("workouts", "0006_alter_like_workout"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicTimelineItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("created_on", models.DateTimeField(auto_now_add=True)),
+                ("published_on", models.DateTimeField(db_index=True)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="activitypub.actor",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-published_on",),
+            },
+        ),
+        migrations.RunPython(seed_public_timeline, migrations.RunPython.noop),
+    ]
@@ -19,3 +19,29 @@ class FeedItem(models.Model):
 
     class Meta:
         ordering = ("-published_on",)
+        indexes = [
+            models.Index(
+                fields=["target", "-published_on"],
+                name="feeditem_target_published_idx",
+            ),
+        ]
+
+
+class PublicTimelineItem(models.Model):
+    """
+    Append-only list of the most recent public content by local actors, this is
+    what anonymous visitors get to see. Trimmed by the prune_feeds job.
+    """
+
+    source = models.ForeignKey(
+        "activitypub.Actor", related_name="+", on_delete=models.CASCADE
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+    created_on = models.DateTimeField(auto_now_add=True)
+    published_on = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ("-published_on",)
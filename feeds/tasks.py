@@ -0,0 +1,64 @@
+import logging
+
+from activitypub.models import Actor
+from fedletic.celery import app
+from feeds import methods as feed_methods
+
+log = logging.getLogger(__name__)
+
+
+@app.task()
+def prune_feeds():
+    removed = feed_methods.prune_feeds()
+    public_removed = feed_methods.prune_public_timeline()
+
+    # Deleting only leaves dead tuples behind, vacuum so their space gets reused.
+    # A plain VACUUM rarely shrinks the table, so report the dead tuples it freed
+    # rather than a change in size.
+    stats_before = feed_methods.get_feed_table_stats()
+    feed_methods.vacuum_feed_table()
+    stats_after = feed_methods.get_feed_table_stats()
+
+    report = {
+        "removed": removed,
+        "public_removed": public_removed,
+        "dead_tuples_freed": max(
+            0, stats_before["dead_tuples"] - stats_after["dead_tuples"]
+        ),
+        "dead_tuples": stats_after["dead_tuples"],
+        "total_size": stats_after["total_size"],
+        "index_size": stats_after["index_size"],
+    }
+    log.info(
+        "Pruned feeds removed=%s public_removed=%s dead_tuples_freed=%s dead_tuples=%s total_size=%s index_size=%s",
+        report["removed"],
+        report["public_removed"],
+        report["dead_tuples_freed"],
+        report["dead_tuples"],
+        report["total_size"],
+        report["index_size"],
+    )
+    return report
+
+
+@app.task()
+def backfill_feed(actor_id, source_id):
+    actor = Actor.objects.get(pk=actor_id)
+    if actor.is_remote:
+        # Remote actors don't have a feed on this instance.
+        return
+
+    source = Actor.objects.get(pk=source_id)
+    added = feed_methods.backfill_feed(target=actor, source=source)
+    log.info("Backfilled feed of actor=%s source=%s added=%s", actor, source, added)
+
+
+@app.task()
+def purge_feed(actor_id, source_id):
+    actor = Actor.objects.get(pk=actor_id)
+    if actor.is_remote:
+        return
+
+    source = Actor.objects.get(pk=source_id)
+    removed = feed_methods.remove_from_feed(target=actor, source=source)
+    log.info("Purged feed of actor=%s source=%s removed=%s", actor, source, removed)
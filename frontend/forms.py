@@ -1,14 +1,11 @@
-import sys
-from io import BytesIO
-
 from django import forms
 from django.core.exceptions import ValidationError
 from django.core.files.images import get_image_dimensions
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.validators import MaxLengthValidator
-from PIL import Image
 
+from fedletic import images
 from fedletic.models import FedleticUser
+from fedletic.tasks import generate_image_variants
 
 
 class VerifyEmailForm(forms.Form):
@@ -145,7 +142,8 @@ class ProfileEditForm(forms.Form):
 
     def save(self, actor):
         """
-        Update the actor model with form data
+        Update the actor model with form data and save it, resized variants of
+        new images are generated in the background.
 
         Args:
             actor: The actor model instance to update
@@ -159,113 +157,38 @@ class ProfileEditForm(forms.Form):
         if self.cleaned_data.get("summary"):
             actor.summary = self.cleaned_data["summary"]
 
-        if self.cleaned_data.get("avatar"):
-            # Process avatar image
-            resized_avatar = self.handle_uploaded_image(
-                self.cleaned_data["avatar"], "avatar"
-            )
-            # Delete old icon if it exists
+        # Uploads are stored without their metadata right away, generate_image_variants
+        # bounds them and makes the resized variants later so the request doesn't wait.
+        if avatar := self.cleaned_data.get("avatar"):
             if actor.icon:
+                images.clear_variants(actor, "icon")
                 actor.icon.delete(save=False)
-            # Assign new image to the ImageField
-            actor.icon = resized_avatar
+            actor.icon = images.remove_metadata(avatar, avatar.name)
 
-        if self.cleaned_data.get("header_image"):
-            # Process header image
-            resized_header = self.handle_uploaded_image(
-                self.cleaned_data["header_image"], "header"
-            )
-            # Delete old header if it exists
+        if header := self.cleaned_data.get("header_image"):
             if actor.header:
+                images.clear_variants(actor, "header")
                 actor.header.delete(save=False)
-            # Assign new image to the ImageField
-            actor.header = resized_header
+            actor.header = images.remove_metadata(header, header.name)
+
+        actor.save()
+
+        if avatar:
+            generate_image_variants.delay_on_commit(
+                actor._meta.label,
+                actor.pk,
+                "icon",
+                images.AVATAR_VARIANT_WIDTHS,
+                square=True,
+                max_size=images.AVATAR_MAX_SIZE,
+            )
+        if header:
+            generate_image_variants.delay_on_commit(
+                actor._meta.label,
+                actor.pk,
+                "header",
+                images.HEADER_VARIANT_WIDTHS,
+                max_size=images.HEADER_MAX_SIZE,
+            )
 
         return actor
-
-    def resize_image(self, image_file, max_width, max_height, is_avatar=False):
-        """
-        Resize an uploaded image while maintaining aspect ratio
-
-        Args:
-            image_file: The uploaded image file
-            max_width: Maximum width for resized image
-            max_height: Maximum height for resized image
-            is_avatar: Boolean indicating if this is an avatar (square crop if True)
-
-        Returns:
-            InMemoryUploadedFile: The resized image file
-        """
-        img = Image.open(image_file)
-
-        # Convert to RGB if necessary (removes transparency)
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-
-        # Get original dimensions
-        width, height = img.size
-
-        # Calculate new dimensions maintaining aspect ratio
-        if is_avatar:
-            # For avatar, we'll crop to a square first, then resize
-            if width > height:
-                # Landscape orientation
-                left = (width - height) / 2
-                top = 0
-                right = (width + height) / 2
-                bottom = height
-            else:
-                # Portrait orientation
-                left = 0
-                top = (height - width) / 2
-                right = width
-                bottom = (height + width) / 2
-
-            # Crop to square
-            img = img.crop((left, top, right, bottom))
-
-            # Resize to target dimensions
-            img = img.resize((max_width, max_height), Image.LANCZOS)
-        else:
-            # For header images, maintain aspect ratio
-            if width > max_width or height > max_height:
-                ratio = min(max_width / width, max_height / height)
-                new_width = int(width * ratio)
-                new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-
-        # Save the resized image to a BytesIO object
-        output = BytesIO()
-        img.save(output, format="JPEG", quality=85)
-        output.seek(0)
-
-        # Create a new InMemoryUploadedFile from the BytesIO object
-        return InMemoryUploadedFile(
-            output,
-            "ImageField",
-            f"{image_file.name.split('.')[0]}_resized.jpg",
-            "image/jpeg",
-            sys.getsizeof(output),
-            None,
-        )
-
-    def handle_uploaded_image(self, image, image_type="avatar"):
-        """
-        Handle image upload including resizing
-
-        Args:
-            image: The uploaded image file
-            image_type: Type of image ('avatar' or 'header')
-
-        Returns:
-            str: The URI for the saved image
-        """
-        # Set resize dimensions based on image type
-        if image_type == "avatar":
-            resized_image = self.resize_image(image, 400, 400, is_avatar=True)
-        else:  # header
-            resized_image = self.resize_image(image, 1500, 500, is_avatar=False)
-
-        # Return the resized image file to be assigned to the model's ImageField
-        # The model will handle storage when saved
-        return resized_image
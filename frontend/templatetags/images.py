@@ -0,0 +1,40 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+
+from fedletic.images import VARIANT_FORMATS
+
+register = template.Library()
+
+
+@register.inclusion_tag("frontend/partials/responsive-image.html")
+def responsive_image(src, variants, sizes, **attributes):
+    """
+    Renders an image with its resized variants (see fedletic.images) as a
+    <picture>, so browsers download the smallest variant that fits sizes in the
+    best format they support. Without variants it's a plain <img> of src.
+
+    Usage: {% responsive_image actor.icon_uri actor.icon_variants "40px" class="h-10 w-10" alt="Avatar" %}
+    """
+    sources = []
+    if variants:
+        for image_format in VARIANT_FORMATS:
+            extension = image_format.lower()
+            srcset = ", ".join(
+                f"{default_storage.url(variant['name'])} {variant['width']}w"
+                for variant in variants["variants"]
+                if variant["format"] == extension
+            )
+            if srcset:
+                sources.append({"type": f"image/{extension}", "srcset": srcset})
+
+        # Shown while the image loads.
+        attributes["style"] = f"background-color: {variants['color']}"
+        attributes["data-blurhash"] = variants["blurhash"]
+
+    return {
+        "src": src,
+        "sizes": sizes,
+        "sources": sources,
+        "attributes": flatatt(attributes),
+    }
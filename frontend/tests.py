@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import RequestFactory, TestCase
+
+from activitypub.models import Actor
+from feeds.methods import distribute_to_feed
+from frontend.views import WorkoutView
+from workouts.consts import WORKOUT_STATUS_FINISHED
+from workouts.methods import record_counter_delta
+from workouts.models import Comment, Like, Workout
+
+
+class WorkoutViewTestCase(TestCase):
+    def setUp(self):
+        self.actor = Actor.objects.create(
+            webfinger="athlete@example.com", name="Athlete"
+        )
+        self.workout = Workout.objects.create(
+            actor=self.actor,
+            name="Ride",
+            workout_type="cycling",
+            status=WORKOUT_STATUS_FINISHED,
+        )
+        for i in range(5):
+            fan = Actor.objects.create(webfinger=f"fan{i}@example.com", name=f"Fan {i}")
+            Comment.objects.create(actor=fan, workout=self.workout, content="Nice!")
+            Like.objects.create(actor=fan, workout=self.workout)
+
+        self.viewer = Actor.objects.create(
+            webfinger="viewer@example.com", name="Viewer"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="viewer", actor=self.viewer, email_verified=True
+        )
+
+    def get(self, user):
+        request = RequestFactory().get(f"/@{self.actor.webfinger}/{self.workout.ap_id}")
+        request.user = user
+        request.session = SessionStore()
+        return WorkoutView.as_view()(
+            request, webfinger=self.actor.webfinger, workout_id=self.workout.ap_id
+        )
+
+    def test_query_budget(self):
+        # The workout, its comments, its likes and the sidebar's actor of the user,
+        # however many comments and likes there are.
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(4):
+            response = self.get(user)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Nice!", count=5)
+
+
+class ConditionalPagesTestCase(TestCase):
+    def setUp(self):
+        self.actor = Actor.objects.create(
+            webfinger=f"athlete@{settings.SITE_URL}", name="Athlete"
+        )
+        self.workout = Workout.objects.create(
+            actor=self.actor,
+            name="Ride",
+            workout_type="cycling",
+            status=WORKOUT_STATUS_FINISHED,
+        )
+        distribute_to_feed(source=self.actor, content_object=self.workout)
+
+        user = get_user_model().objects.create_user(
+            username="athlete", actor=self.actor, email_verified=True
+        )
+        self.client.force_login(user)
+
+    def get_etag(self, url):
+        # The first visit sets the CSRF cookie, which is part of the ETag.
+        self.client.get(url)
+        return self.client.get(url)["ETag"]
+
+    def assertNotModifiedUntilLiked(self, url):
+        etag = self.get_etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        record_counter_delta(self.workout, likes=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_profile(self):
+        self.assertNotModifiedUntilLiked("/@athlete")
+
+    def test_feed(self):
+        self.assertNotModifiedUntilLiked("/feed")
+
+    def test_feed_skips_loading_the_feed(self):
+        etag = self.get_etag("/feed")
+        with mock.patch("frontend.views.get_feed") as get_feed:
+            self.client.get("/feed", HTTP_IF_NONE_MATCH=etag)
+        get_feed.assert_not_called()
+
+    def test_post_renders_the_page(self):
+        etag = self.get_etag("/@athlete")
+        response = self.client.post("/@athlete", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
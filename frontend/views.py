@@ -1,12 +1,29 @@
+import datetime
+import hashlib
+from typing import Optional
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.db.models import F
+from django.db.models import Exists, OuterRef, Subquery
 from django.db.transaction import atomic
-from django.http import Http404, HttpRequest, HttpResponseNotFound, JsonResponse
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotFound,
+    JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render, reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django.views import View
 from rest_framework import status
 
+from activitypub.documents import document_response, render_document
 from activitypub.methods import (
     create_actor,
     fetch_remote_actor,
@@ -17,7 +34,12 @@ from activitypub.methods import (
 from activitypub.models import Actor
 from fedletic.methods import generate_and_send_verification_email, verify_email
 from fedletic.models import FedleticUser
-from feeds.models import FeedItem
+from feeds.methods import (
+    get_feed,
+    get_feed_version,
+    get_public_timeline,
+    get_public_timeline_version,
+)
 from frontend.forms import (
     AccountEditForm,
     LoginForm,
@@ -27,7 +49,14 @@ from frontend.forms import (
 )
 from workouts.consts import WORKOUT_STATUS_FINISHED
 from workouts.forms import CreateWorkoutForm
-from workouts.methods import create_workout
+from workouts.methods import (
+    annotate_pending_counts,
+    create_image_attachment,
+    create_workout,
+    get_workouts_version,
+    merge_pending_counts,
+    record_counter_delta,
+)
 from workouts.models import Comment, Like, Workout
 from workouts.tasks import process_workout
 
@@ -67,6 +96,70 @@ def handle_login(request):
     return form, user
 
 
+# Only pages that were asked for are answered conditionally, see get_not_modified_response.
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+
+def get_page_etag(request: HttpRequest, *versions) -> str:
+    """
+    Returns a weak ETag for a page, made of the versions of whatever the page
+    shows. Pages also show the signed in user in the sidebar and embed their
+    CSRF token, so those are always part of it.
+    """
+    viewer = None
+    if request.user.is_authenticated:
+        actor = request.user.actor
+        viewer = (
+            actor.pk,
+            actor.updated_on,
+            actor.followers_count,
+            actor.following_count,
+        )
+
+    version = repr(
+        (settings.VERSION, viewer, request.META.get("CSRF_COOKIE"), versions)
+    )
+    return f'W/"{hashlib.sha256(version.encode()).hexdigest()}"'
+
+
+def set_page_etag(request: HttpRequest, response: HttpResponse, etag: str):
+    if request.method not in CONDITIONAL_METHODS:
+        return
+
+    response.headers["ETag"] = etag
+    if request.user.is_authenticated:
+        # Browsers check back before reusing the page, the ETag keeps that cheap.
+        patch_cache_control(response, private=True, no_cache=True)
+
+
+def get_not_modified_response(
+    request: HttpRequest, etag: str
+) -> Optional[HttpResponse]:
+    """
+    Returns the response to a conditional request for a page that didn't change
+    since the client got it, or None when the page has to be rendered. POST
+    handlers render their page through get(), those always get the full page.
+    """
+    if request.method not in CONDITIONAL_METHODS:
+        return None
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_page_etag(request, response, etag)
+    return response
+
+
+def get_workout_version(workout: Workout):
+    """The version of everything a workout card shows."""
+    return (
+        workout.pk,
+        workout.updated_on,
+        workout.actor.updated_on,
+        workout.current_like_count,
+        workout.current_comment_count,
+    )
+
+
 class LandingView(View):
 
     @atomic
@@ -101,12 +194,19 @@ class LandingView(View):
         return render(
             request,
             "frontend/landing.html",
-            {"register_form": register_form, "login_form": login_form},
+            {
+                "register_form": register_form,
+                "login_form": login_form,
+                "timeline_items": get_public_timeline(limit=3),
+            },
         )
 
 
 class FedleticView(View):
     REQUIRES_AUTHENTICATED_USER = False
+    # Views that load the actor of the webfinger in the URL along with their own
+    # objects turn this off and filter on request.webfinger instead.
+    LOAD_ACTOR = True
 
     def get_ap(self, request, **kwargs):
         raise NotImplementedError
@@ -122,12 +222,15 @@ class FedleticView(View):
 
         # Handle actor extraction first
         actor = None
+        webfinger = None
         if "webfinger" in kwargs:
             webfinger = kwargs["webfinger"]
             if "@" not in webfinger:
                 webfinger = f"{webfinger}@{settings.SITE_URL}"
-            actor = Actor.objects.get(webfinger=webfinger)
+            if self.LOAD_ACTOR:
+                actor = Actor.objects.get(webfinger=webfinger)
 
+        setattr(request, "webfinger", webfinger)
         setattr(request, "actor", actor)
 
         # Check for ActivityPub content negotiation
@@ -244,8 +347,7 @@ class EditProfileView(FedleticView):
         if action == "update_profile":
             form = ProfileEditForm(request.POST, request.FILES)
             if form.is_valid():
-                updated_actor = form.save(request.user.actor)
-                updated_actor.save()  # Now this save will store the images
+                form.save(request.user.actor)
                 return self.get(request)
 
         if action == "update_account":
@@ -320,11 +422,35 @@ class ProfileView(View):
             following = request.user.actor.following.filter(target=actor).exists()
             is_actor = actor == request.user.actor
 
-        return render(
+        etag = get_page_etag(
+            request,
+            actor.pk,
+            actor.updated_on,
+            actor.followers_count,
+            actor.following_count,
+            following,
+            is_actor,
+            get_workouts_version(actor.workout_workouts.all()),
+        )
+        response = get_not_modified_response(request, etag)
+        if response is not None:
+            return response
+
+        workouts = list(actor.workout_workouts.select_related("actor"))
+        merge_pending_counts(workouts)
+
+        response = render(
             request,
             "frontend/profile/view-profile.html",
-            {"actor": actor, "is_actor": is_actor, "following": following},
+            {
+                "actor": actor,
+                "is_actor": is_actor,
+                "following": following,
+                "workouts": workouts,
+            },
         )
+        set_page_etag(request, response, etag)
+        return response
 
 
 class LogoutView(FedleticView):
@@ -335,12 +461,53 @@ class LogoutView(FedleticView):
 
 class FeedView(FedleticView):
     def get(self, request):
+        before = before_id = None
+        if request.GET.get("before"):
+            try:
+                before = datetime.datetime.fromisoformat(request.GET["before"])
+                before_id = int(request.GET.get("before_id", ""))
+            except ValueError:
+                pass
+
         if request.user.is_authenticated:
-            feed_items = FeedItem.objects.filter(target=request.user.actor)
+            version = get_feed_version(target=request.user.actor)
         else:
-            # TODO: construct public feed.
-            feed_items = []
-        return render(request, "frontend/feed.html", {"feed_items": feed_items})
+            version = get_public_timeline_version()
+
+        etag = get_page_etag(request, version)
+        response = get_not_modified_response(request, etag)
+        if response is None:
+            if request.user.is_authenticated:
+                feed_items = get_feed(
+                    target=request.user.actor, before=before, before_id=before_id
+                )
+            else:
+                feed_items = get_public_timeline(before=before, before_id=before_id)
+
+            next_page = None
+            if len(feed_items) == settings.FEED_PAGE_SIZE:
+                next_page = urlencode(
+                    {
+                        "before": feed_items[-1].published_on.isoformat(),
+                        "before_id": feed_items[-1].object_id,
+                    }
+                )
+
+            response = render(
+                request,
+                "frontend/feed.html",
+                {"feed_items": feed_items, "next_page": next_page},
+            )
+            set_page_etag(request, response, etag)
+
+        if not request.user.is_authenticated:
+            # The public timeline looks the same for every anonymous visitor.
+            patch_cache_control(
+                response, public=True, max_age=settings.PUBLIC_TIMELINE_MAX_AGE
+            )
+            patch_vary_headers(response, ["Cookie"])
+
+        return response
 
 
 class CreateWorkoutView(FedleticView):
@@ -357,6 +524,8 @@ class CreateWorkoutView(FedleticView):
             name=form.cleaned_data.get("name"),
         )
         process_workout.delay_on_commit(workout_id=workout.id)
+        for photo in form.cleaned_data["photos"]:
+            create_image_attachment(workout=workout, image=photo)
 
         return redirect(
             reverse(
@@ -379,9 +548,18 @@ class CreateWorkoutView(FedleticView):
 
 
 class WorkoutView(FedleticView):
+    LOAD_ACTOR = False
+
     def get_ap(self, request, workout_id, **kwargs):
-        workout = Workout.objects.get(ap_id=workout_id, actor=request.actor)
-        return JsonResponse(workout.as_activitypub_object())
+        workout = get_object_or_404(
+            Workout.objects.select_related("actor"),
+            ap_id=workout_id,
+            actor__webfinger=request.webfinger,
+        )
+        body, etag = workout.get_activitypub_document()
+        return document_response(
+            request, body=body, etag=etag, content_type="application/activity+json"
+        )
 
     @atomic
     def post(self, request, workout_id, **kwargs):
@@ -389,7 +567,9 @@ class WorkoutView(FedleticView):
         if not self.request.user.is_authenticated:
             return self.get(request, workout_id, **kwargs)
 
-        workout = Workout.objects.get(ap_id=workout_id, actor=request.actor)
+        workout = get_object_or_404(
+            Workout, ap_id=workout_id, actor__webfinger=request.webfinger
+        )
         action = request.POST.get("action")
         if action == "add_comment":
             Comment.objects.create(
@@ -397,9 +577,7 @@ class WorkoutView(FedleticView):
                 workout=workout,
                 content=request.POST.get("comment"),
             )
-            Workout.objects.filter(pk=workout.pk).update(
-                comment_count=F("comment_count") + 1
-            )
+            record_counter_delta(workout, comments=1)
 
         if action == "add_like":
             _, created = Like.objects.get_or_create(
@@ -408,9 +586,7 @@ class WorkoutView(FedleticView):
             )
 
             if created:
-                Workout.objects.filter(pk=workout.pk).update(
-                    like_count=F("like_count") + 1
-                )
+                record_counter_delta(workout, likes=1)
 
         if action == "remove_like":
             like = Like.objects.filter(
@@ -420,45 +596,80 @@ class WorkoutView(FedleticView):
 
             if like:
                 like.delete()
-                Workout.objects.filter(pk=workout.pk).update(
-                    like_count=F("like_count") - 1
-                )
+                record_counter_delta(workout, likes=-1)
 
         return self.get(request, workout_id, **kwargs)
 
     def get(self, request, workout_id, **kwargs):
-        # TODO: prefetch/select related
+        workouts = annotate_pending_counts(
+            Workout.objects.select_related("actor", "metrics")
+        )
+        if request.user.is_authenticated:
+            # Check if the current user has liked this workout
+            workouts = workouts.annotate(
+                user_has_liked=Exists(
+                    Like.objects.filter(
+                        workout=OuterRef("pk"), actor_id=request.user.actor_id
+                    )
+                )
+            )
+        # The newest like and comment, for the ETag.
+        workouts = workouts.annotate(
+            latest_comment_id=Subquery(
+                Comment.objects.filter(workout=OuterRef("pk"))
+                .order_by("-id")
+                .values("id")[:1]
+            ),
+            latest_like_id=Subquery(
+                Like.objects.filter(workout=OuterRef("pk"))
+                .order_by("-id")
+                .values("id")[:1]
+            ),
+        )
+
         try:
-            workout = Workout.objects.get(ap_id=workout_id, actor=request.actor)
+            workout = workouts.get(ap_id=workout_id, actor__webfinger=request.webfinger)
         except Workout.DoesNotExist:
             raise Http404
+
+        etag = get_page_etag(
+            request,
+            get_workout_version(workout),
+            workout.status,
+            workout.latest_comment_id,
+            workout.latest_like_id,
+            getattr(workout, "user_has_liked", False),
+        )
+        response = get_not_modified_response(request, etag)
+        if response is not None:
+            return response
+
         if workout.status != WORKOUT_STATUS_FINISHED:
-            return render(
+            response = render(
                 request, "frontend/workouts/pending.html", {"workout": workout}
             )
+            set_page_etag(request, response, etag)
+            return response
 
-        comments = workout.comments.all().order_by(
-            "created_on"
+        comments = list(
+            workout.comments.select_related("actor").order_by("created_on")
         )  # Oldest comments first.
-        likes = workout.likes.all()[
-            0:20
-        ]  # We get at most 20 likes, otherwise the list becomes too long.
+        likes = list(
+            workout.likes.select_related("actor")[0:20]
+        )  # We get at most 20 likes, otherwise the list becomes too long.
 
-        # Check if the current user has liked this workout
-        user_has_liked = False
-        if request.user.is_authenticated:
-            user_has_liked = workout.likes.filter(actor=request.user.actor).exists()
-
-        return render(
+        response = render(
             request,
             "frontend/workouts/view.html",
             {
                 "workout": workout,
                 "comments": comments,
                 "likes": likes,
-                "user_has_liked": user_has_liked,
+                "user_has_liked": getattr(workout, "user_has_liked", False),
             },
         )
+        set_page_etag(request, response, etag)
+        return response
 
 
 class WorkoutNoteView(FedleticView):
@@ -475,7 +686,10 @@ class WorkoutNoteView(FedleticView):
             return JsonResponse(
                 {"error": "not found"}, status=status.HTTP_404_NOT_FOUND
             )
-        return JsonResponse(activity.object_json)
+        body, etag = render_document(activity.object_json)
+        return document_response(
+            request, body=body, etag=etag, content_type="application/activity+json"
+        )
 
     def get(self, request, webfinger, workout_id):
         if "@" not in webfinger:
@@ -1,71 +1,105 @@
 import logging
 
 import bleach
-import httpx
-from django.db.models import F
+from django.conf import settings
+from django.core.cache import cache
 
 from activitypub.events import events
+from activitypub.fetch import fetch_object
 from activitypub.models import Activity
 from feeds.methods import distribute_to_feed
+from workouts.consts import WORKOUT_STATUS_FINISHED
+from workouts.methods import record_counter_delta
 from workouts.models import Comment, Workout
 
 log = logging.getLogger(__name__)
 
 
-@events.on("activity")
-def process_incoming_activity(activity_id):
-    activity = Activity.objects.get(pk=activity_id)
-    log.debug(
-        "Incoming activity id=%s type=%s",
-        activity_id,
-        activity.activity_type,
+# Importing workouts means fetching them, so keep that from holding up other handlers.
+@events.route("Create", "Workout", mode=events.MODE_TASK)
+def process_incoming_workout(activity: Activity):
+    log.info("Creating incoming workout=%s", activity.object_json)
+    url = activity.object_json["content"]
+    ap_uri = activity.object_json.get("id")
+    if import_remote_workout(url=url, ap_uri=ap_uri, actor=activity.actor):
+        return
+
+    # Another delivery of the workout is importing it. Its fetch may still fail,
+    # so check back once it's done rather than dropping this one.
+    from workouts.tasks import retry_remote_workout_import
+
+    retry_remote_workout_import.apply_async(
+        kwargs={"url": url, "ap_uri": ap_uri, "actor_id": activity.actor_id},
+        countdown=settings.WORKOUT_IMPORT_RETRY_DELAY,
     )
 
-    if not activity.activity_type == "Create":
-        # TODO: support update etcetera.
-        return
 
-    if not activity.object_json:
-        # Not going to do anything with this, as we expect an object to be inside of the Create.
-        # TODO: support URIs
+@events.route("Create", "Note")
+def process_incoming_note(activity: Activity):
+    log.info("Creating incoming note=%s", activity.object_json)
+    ap_uri = activity.object_json.get("inReplyTo")
+    if not ap_uri:
+        log.warning("Incoming note %s does not have an ap_uri", activity.id)
         return
 
-    if activity.object_json["type"] == "Workout":
-        log.info("Creating incoming workout=%s", activity.object_json)
-        activity_object = httpx.get(
-            activity.object_json["content"],
-            headers={"accept": "application/activity+json"},
+    ap_uri = "/".join(ap_uri.split("/")[0:-1])
+    try:
+        workout = Workout.objects.get(ap_uri=ap_uri)
+    except Workout.DoesNotExist:
+        log.warning(
+            "Incoming note %s refers to a workout that does not exist (%s)",
+            activity.id,
+            ap_uri,
         )
+        return
+
+    comment = bleach.clean(activity.object_json["content"], tags=[], strip=True)
+    Comment.objects.create(
+        actor=activity.actor,
+        workout=workout,
+        content=comment,
+    )
+    record_counter_delta(workout, comments=1)
+
+
+@events.on(events.EVENT_NODE_STATS)
+def count_local_workouts():
+    return {
+        "local_posts": Workout.objects.filter(
+            actor__is_remote=False, status=WORKOUT_STATUS_FINISHED
+        ).count()
+    }
+
+
+def import_remote_workout(url, ap_uri, actor) -> bool:
+    """
+    Fetches and creates a remote workout, unless it was imported before. The same
+    workout can be announced through several paths at once, the import lock makes
+    sure only one of them fetches and creates it.
+
+    Returns False when another import of the workout holds the lock, the caller
+    should try again later. Returns True otherwise, also when the fetch failed.
+    """
+    ap_uri = ap_uri or url
+    lock_key = f"workout-import:{ap_uri}"
+    if not cache.add(lock_key, 1, timeout=settings.ACTIVITYPUB_FETCH_TIMEOUT * 3):
+        log.info("Workout=%s is already being imported", ap_uri)
+        return False
+
+    try:
+        if Workout.objects.filter(ap_uri=ap_uri).exists():
+            log.info("Workout=%s was already imported", ap_uri)
+            return True
+
+        ap_object = fetch_object(url)
+        if not ap_object:
+            return True
+
         workout = Workout.create_from_activitypub_object(
-            ap_object=activity_object.json(), actor=activity.actor
+            ap_object=ap_object, actor=actor
         )
         log.debug("Created new workout")
         distribute_to_feed(source=workout.actor, content_object=workout)
-
-    elif activity.object_json["type"] == "Note":
-        log.info("Creating incoming note=%s", activity.object_json)
-        ap_uri = activity.object_json.get("inReplyTo")
-        if not ap_uri:
-            log.warning("Incoming note %s does not have an ap_uri", activity_id)
-            return
-
-        ap_uri = "/".join(ap_uri.split("/")[0:-1])
-        try:
-            workout = Workout.objects.get(ap_uri=ap_uri)
-        except Workout.DoesNotExist:
-            log.warning(
-                "Incoming note %s refers to a workout that does not exist (%s)",
-                activity_id,
-                ap_uri,
-            )
-            return
-
-        comment = bleach.clean(activity.object_json["content"], tags=[], strip=True)
-        Comment.objects.create(
-            actor=activity.actor,
-            workout=workout,
-            content=comment,
-        )
-        Workout.objects.filter(pk=workout.pk).update(
-            comment_count=F("comment_count") + 1
-        )
+        return True
+    finally:
+        cache.delete(lock_key)
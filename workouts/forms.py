@@ -5,9 +5,28 @@ from workouts import methods as workout_methods
 from workouts.exceptions import FitFileException
 
 
+class MultipleImageInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """Image field that accepts several files, cleans to a list of images."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleImageInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(image, initial) for image in data]
+        return [single_file_clean(data, initial)] if data else []
+
+
 class CreateWorkoutForm(forms.Form):
     name = forms.CharField(max_length=128, required=False)
     fit_file = forms.FileField()
+    photos = MultipleImageField(required=False)
 
     def clean_fit_file(self):
         try:
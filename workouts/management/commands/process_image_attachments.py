@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from workouts import methods as wo_methods
+from workouts.models import ImageAttachment
+from workouts.tasks import process_image_attachment
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process the image attachments that haven't been processed yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of image attachments fetched per query",
+        )
+        parser.add_argument(
+            "--inline",
+            action="store_true",
+            help="Process the attachments in this process instead of queueing them for the workers",
+        )
+
+    def handle(self, *args, batch_size=None, inline=False, **options):
+        processed = failed = 0
+
+        for batch in wo_methods.get_unprocessed_image_attachments(batch_size):
+            if not inline:
+                for attachment_id in batch:
+                    process_image_attachment.delay(attachment_id)
+                processed += len(batch)
+                continue
+
+            for attachment in ImageAttachment.objects.filter(pk__in=batch):
+                try:
+                    wo_methods.process_image_attachment(attachment)
+                    processed += 1
+                except Exception:
+                    log.exception(
+                        "Failed to process image attachment=%s", attachment.pk
+                    )
+                    failed += 1
+
+        self.stdout.write(
+            f"{'processed' if inline else 'queued'}={processed} failed={failed}"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Processed image attachments."
+                if inline
+                else "Queued image attachments for processing."
+            )
+        )
@@ -1,19 +1,84 @@
 import datetime
 import logging
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Max, Min, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.db.transaction import atomic
 from django.urls import reverse
 from garmin_fit_sdk import Decoder, Stream
 
+from fedletic import images
 from workouts.consts import WORKOUT_TYPES_CHOICES, WORKOUT_TYPES_LIST
 from workouts.exceptions import FitFileException
-from workouts.models import Workout
+from workouts.models import (
+    WORKOUT_METRICS_FIELDS,
+    Comment,
+    ImageAttachment,
+    Like,
+    Workout,
+    WorkoutCounterDelta,
+)
 
 log = logging.getLogger(__name__)
 
+# Flushes and recounts both write the counters based on the pending changes. Every
+# flush batch holds this advisory lock shared and every recount chunk exclusively, so a
+# recount never runs while a flush is between applying its changes and deleting them.
+COUNTER_DELTAS_LOCK_ID = 45_000_045
+
+# Sets the counters of the workouts in [start, end) to their actual counts, minus the
+# changes that are still waiting to be flushed, and reports how far off they were.
+# Only rows whose counters drifted are written.
+RECOUNT_COUNTERS_SQL = """
+WITH drifted AS (
+    UPDATE {workout} AS workout
+    SET like_count = counts.likes, comment_count = counts.comments
+    FROM (
+        SELECT
+            w.id,
+            w.like_count AS old_likes,
+            w.comment_count AS old_comments,
+            COALESCE(likes.total, 0) - COALESCE(deltas.likes, 0) AS likes,
+            COALESCE(comments.total, 0) - COALESCE(deltas.comments, 0) AS comments
+        FROM {workout} AS w
+        LEFT JOIN (
+            SELECT workout_id, COUNT(*) AS total FROM {like}
+            WHERE workout_id >= %(start)s AND workout_id < %(end)s
+            GROUP BY workout_id
+        ) AS likes ON likes.workout_id = w.id
+        LEFT JOIN (
+            SELECT workout_id, COUNT(*) AS total FROM {comment}
+            WHERE workout_id >= %(start)s AND workout_id < %(end)s
+            GROUP BY workout_id
+        ) AS comments ON comments.workout_id = w.id
+        LEFT JOIN (
+            SELECT workout_id, SUM(likes) AS likes, SUM(comments) AS comments
+            FROM {delta}
+            WHERE workout_id >= %(start)s AND workout_id < %(end)s
+            GROUP BY workout_id
+        ) AS deltas ON deltas.workout_id = w.id
+        WHERE w.id >= %(start)s AND w.id < %(end)s
+    ) AS counts
+    WHERE workout.id = counts.id
+    AND (
+        workout.like_count <> counts.likes
+        OR workout.comment_count <> counts.comments
+    )
+    RETURNING counts.old_likes, counts.likes, counts.old_comments, counts.comments
+)
+SELECT
+    COUNT(*),
+    COALESCE(SUM(ABS(likes - old_likes)), 0),
+    COALESCE(SUM(ABS(comments - old_comments)), 0)
+FROM drifted
+"""
+
 
 def generate_cycling_workout_description(workout):
+    metrics = workout.get_metrics()
     parts = []
 
     # Distance
@@ -46,36 +111,36 @@ def generate_cycling_workout_description(workout):
         parts[0] += f" in {time_text}"
 
     # Average Speed
-    if workout.speed_avg:
-        speed_kph = workout.speed_avg * 3.6  # Convert m/s to km/h
+    if metrics.speed_avg:
+        speed_kph = metrics.speed_avg * 3.6  # Convert m/s to km/h
         parts.append(f"Averaged {speed_kph:.1f} km/h")
 
     # Max Speed
-    if workout.speed_max:
-        max_speed_kph = workout.speed_max * 3.6  # Convert m/s to km/h
+    if metrics.speed_max:
+        max_speed_kph = metrics.speed_max * 3.6  # Convert m/s to km/h
         parts.append(f"Hit a top speed of {max_speed_kph:.1f} km/h")
 
     # Heart Rate
     hr_parts = []
-    if workout.heart_rate_avg:
-        hr_parts.append(f"avg HR of {workout.heart_rate_avg} bpm")
-    if workout.heart_rate_max:
-        hr_parts.append(f"max HR of {workout.heart_rate_max} bpm")
+    if metrics.heart_rate_avg:
+        hr_parts.append(f"avg HR of {metrics.heart_rate_avg} bpm")
+    if metrics.heart_rate_max:
+        hr_parts.append(f"max HR of {metrics.heart_rate_max} bpm")
 
     if hr_parts:
         parts.append(f"Pushed myself to an {' and '.join(hr_parts)}")
 
     # Power metrics
-    if workout.power_avg:
-        parts.append(f"Put out {workout.power_avg} watts on average")
+    if metrics.power_avg:
+        parts.append(f"Put out {metrics.power_avg} watts on average")
 
     # Cadence
-    if workout.cadence_avg:
-        parts.append(f"Kept my cadence at {workout.cadence_avg} rpm")
+    if metrics.cadence_avg:
+        parts.append(f"Kept my cadence at {metrics.cadence_avg} rpm")
 
     # Elevation
-    if workout.elevation_gain and workout.elevation_gain > 100:
-        parts.append(f"Climbed {workout.elevation_gain:.0f}m of elevation")
+    if metrics.elevation_gain and metrics.elevation_gain > 100:
+        parts.append(f"Climbed {metrics.elevation_gain:.0f}m of elevation")
 
     # Calories
     if workout.calories_burned:
@@ -91,7 +156,7 @@ def generate_cycling_workout_description(workout):
 
         if distance_km / time_hours > 25:
             description += ". Feeling fast today! 🚴‍♂️💨"
-        elif workout.elevation_gain and workout.elevation_gain > 500:
+        elif metrics.elevation_gain and metrics.elevation_gain > 500:
             description += ". My legs are definitely feeling those climbs! 🏔️"
         elif workout.duration > 7200:  # More than 2 hours
             description += ". A bit tired but satisfied with the long ride today! 💪"
@@ -261,12 +326,224 @@ def process_workout(workout):
     workout_data["temperature_min"] = session.get("min_temperature")
 
     # Update workout with the new data
+    metrics = workout.get_metrics()
     for key, value in workout_data.items():
-        setattr(workout, key, value)
+        setattr(metrics if key in WORKOUT_METRICS_FIELDS else workout, key, value)
 
     # Only generate summary if there is none and sport is cycling
     if not workout.summary and session.get("sport") == "cycling":
         workout.summary = generate_cycling_workout_description(workout=workout)
 
     workout.save()
+    metrics.save()
     return workout
+
+
+def record_counter_delta(workout: Workout, likes: int = 0, comments: int = 0):
+    """Records a change to the like and/or comment counters of workout."""
+    WorkoutCounterDelta.objects.create(workout=workout, likes=likes, comments=comments)
+
+
+def merge_pending_counts(workouts: Iterable[Workout]):
+    """
+    Loads the counter changes that weren't flushed yet for all workouts in a
+    single query, instead of one query per workout when their current counts
+    are shown.
+    """
+    workouts = [workout for workout in workouts if isinstance(workout, Workout)]
+    pending = WorkoutCounterDelta.get_pending_counts(
+        [workout.pk for workout in workouts]
+    )
+    for workout in workouts:
+        workout.pending_counts = pending.get(workout.pk, (0, 0))
+
+
+def annotate_pending_counts(workouts: QuerySet) -> QuerySet:
+    """
+    Annotates workouts with the counter changes that weren't flushed yet, so
+    they're loaded along with the workouts themselves.
+    """
+    deltas = WorkoutCounterDelta.objects.filter(workout=OuterRef("pk")).order_by()
+    deltas = deltas.values("workout")
+    return workouts.annotate(
+        pending_likes=Coalesce(
+            Subquery(deltas.annotate(total=Sum("likes")).values("total")), 0
+        ),
+        pending_comments=Coalesce(
+            Subquery(deltas.annotate(total=Sum("comments")).values("total")), 0
+        ),
+    )
+
+
+def get_workouts_version(workouts: QuerySet) -> Tuple:
+    """
+    Returns the version of everything the workout cards of workouts show, it
+    changes when one of them is added, removed, updated, liked or commented on.
+    Made of two aggregate queries, so pages can check it before they load the
+    workouts themselves.
+    """
+    version = workouts.order_by().aggregate(
+        count=Count("id"),
+        updated_on=Max("updated_on"),
+        actor_updated_on=Max("actor__updated_on"),
+        likes=Sum("like_count"),
+        comments=Sum("comment_count"),
+    )
+    pending = WorkoutCounterDelta.objects.filter(
+        workout__in=workouts.order_by().values("pk")
+    ).aggregate(latest=Max("id"), likes=Sum("likes"), comments=Sum("comments"))
+    return tuple(version.values()) + tuple(pending.values())
+
+
+def _lock_counter_deltas(shared: bool):
+    """Takes the COUNTER_DELTAS_LOCK_ID advisory lock until the transaction ends."""
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s)", [COUNTER_DELTAS_LOCK_ID])
+
+
+def flush_counter_deltas(batch_size: int = None) -> int:
+    """
+    Folds the recorded counter changes into the workout counters, a batch at a
+    time. Every batch is applied with a single UPDATE and deleted in the same
+    transaction, the deltas are locked so concurrent flushes skip them.
+
+    Returns the number of workout rows that were updated.
+    """
+    batch_size = batch_size or settings.WORKOUT_COUNTER_BATCH_SIZE
+    updated = 0
+    while True:
+        with atomic():
+            _lock_counter_deltas(shared=True)
+            delta_ids = list(
+                WorkoutCounterDelta.objects.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not delta_ids:
+                return updated
+
+            deltas = WorkoutCounterDelta.objects.filter(pk__in=delta_ids)
+            totals = deltas.filter(workout=OuterRef("pk")).order_by().values("workout")
+            updated += Workout.objects.filter(pk__in=deltas.values("workout")).update(
+                like_count=F("like_count")
+                + Subquery(totals.annotate(total=Sum("likes")).values("total")),
+                comment_count=F("comment_count")
+                + Subquery(totals.annotate(total=Sum("comments")).values("total")),
+            )
+            deltas.delete()
+
+
+def recount_counters(chunk_size: int = None) -> Dict[str, int]:
+    """
+    Reconciles the like and comment counters of all workouts with the actual
+    likes and comments, a range of chunk_size workout ids per statement.
+    Every chunk is counted with grouped aggregates and applied with a single
+    UPDATE ... FROM that only writes the workouts that drifted. Flushes wait
+    while a chunk is recounted, see COUNTER_DELTAS_LOCK_ID.
+
+    Returns the number of workouts that drifted, and the total number of likes
+    and comments their counters were off by.
+    """
+    chunk_size = chunk_size or settings.WORKOUT_RECOUNT_CHUNK_SIZE
+    stats = {"drifted": 0, "like_drift": 0, "comment_drift": 0}
+
+    bounds = Workout.objects.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return stats
+
+    quote = connection.ops.quote_name
+    sql = RECOUNT_COUNTERS_SQL.format(
+        workout=quote(Workout._meta.db_table),
+        like=quote(Like._meta.db_table),
+        comment=quote(Comment._meta.db_table),
+        delta=quote(WorkoutCounterDelta._meta.db_table),
+    )
+
+    for start in range(bounds["first"], bounds["last"] + 1, chunk_size):
+        end = start + chunk_size
+        with atomic(), connection.cursor() as cursor:
+            _lock_counter_deltas(shared=False)
+            cursor.execute(sql, {"start": start, "end": end})
+            drifted, like_drift, comment_drift = cursor.fetchone()
+
+        if drifted:
+            log.debug(
+                "Recounted workouts=[%s, %s) drifted=%s like_drift=%s comment_drift=%s",
+                start,
+                end,
+                drifted,
+                like_drift,
+                comment_drift,
+            )
+        stats["drifted"] += drifted
+        stats["like_drift"] += like_drift
+        stats["comment_drift"] += comment_drift
+
+    return stats
+
+
+def create_image_attachment(workout: Workout, image) -> ImageAttachment:
+    """
+    Stores an uploaded image as an attachment of workout and queues it for
+    processing. Only the raw upload is stored here, so this is cheap regardless
+    of the size of the photo.
+    """
+    # workouts.tasks imports this module.
+    from workouts.tasks import process_image_attachment
+
+    attachment = ImageAttachment.objects.create(
+        workout=workout, image=image, file_name=image.name
+    )
+    process_image_attachment.delay_on_commit(attachment_id=attachment.pk)
+    return attachment
+
+
+def process_image_attachment(attachment: ImageAttachment):
+    """
+    Strips the metadata of the uploaded image, generates its resized variants and
+    stores its blurhash, dimensions and file size on the attachment.
+    """
+    storage = attachment.image.storage
+    attachment.image = images.strip_metadata(attachment.image)
+
+    variants = images.generate_variants(attachment.image, images.PHOTO_VARIANT_WIDTHS)
+    images.delete_variants(storage, attachment.image_variants)
+
+    attachment.image_variants = variants
+    attachment.blurhash = variants["blurhash"]
+    attachment.image_dimensions = {
+        "width": variants["width"],
+        "height": variants["height"],
+    }
+    attachment.file_size = attachment.image.size
+    attachment.processed_on = datetime.datetime.now()
+    attachment.save(
+        update_fields=[
+            "image",
+            "image_variants",
+            "blurhash",
+            "image_dimensions",
+            "file_size",
+            "processed_on",
+        ]
+    )
+
+
+def get_unprocessed_image_attachments(batch_size: int = None) -> Iterator[List[str]]:
+    """
+    Yields the ids of the image attachments that haven't been processed yet, a
+    batch of batch_size ids at a time, e.g. to backfill rows created before the
+    metadata was computed in the background.
+    """
+    batch_size = batch_size or settings.WORKOUT_IMAGE_BATCH_SIZE
+    pending = ImageAttachment.objects.filter(processed_on__isnull=True).order_by("id")
+    last_id = ""
+    while True:
+        batch = list(
+            pending.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
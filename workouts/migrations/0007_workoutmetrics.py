@@ -0,0 +1,397 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _metric_columns(apps):
+    Workout = apps.get_model("workouts", "Workout")
+    WorkoutMetrics = apps.get_model("workouts", "WorkoutMetrics")
+    columns = [
+        field.column
+        for field in WorkoutMetrics._meta.local_fields
+        if not field.primary_key
+    ]
+    return Workout._meta.db_table, WorkoutMetrics._meta.db_table, columns
+
+
+def copy_metrics(apps, schema_editor):
+    """Copies the metrics of the existing workouts into their own table, in one statement."""
+    workout_table, metrics_table, columns = _metric_columns(apps)
+    quote = schema_editor.quote_name
+    column_list = ", ".join(quote(column) for column in columns)
+    schema_editor.execute(
+        f"INSERT INTO {quote(metrics_table)} ({quote('workout_id')}, {column_list}) "
+        f"SELECT {quote('id')}, {column_list} FROM {quote(workout_table)}"
+    )
+
+
+def restore_metrics(apps, schema_editor):
+    workout_table, metrics_table, columns = _metric_columns(apps)
+    quote = schema_editor.quote_name
+    assignments = ", ".join(
+        f"{quote(column)} = COALESCE((SELECT {quote(column)} FROM {quote(metrics_table)} "
+        f"WHERE {quote('workout_id')} = {quote(workout_table)}.{quote('id')}), {quote(column)})"
+        for column in columns
+    )
+    schema_editor.execute(f"UPDATE {quote(workout_table)} SET {assignments}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("workouts", "0006_alter_like_workout"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkoutMetrics",
+            fields=[
+                ("elevation_gain", models.FloatField(blank=True, null=True)),
+                ("elevation_loss", models.FloatField(blank=True, null=True)),
+                ("heart_rate_min", models.IntegerField(blank=True, null=True)),
+                ("heart_rate_avg", models.IntegerField(blank=True, null=True)),
+                ("heart_rate_max", models.IntegerField(blank=True, null=True)),
+                ("time_in_hr_zones", models.JSONField(blank=True, null=True)),
+                ("training_effect_aerobic", models.FloatField(blank=True, null=True)),
+                ("training_effect_anaerobic", models.FloatField(blank=True, null=True)),
+                ("vo2_max", models.FloatField(blank=True, null=True)),
+                ("altitude_min", models.FloatField(blank=True, null=True)),
+                ("altitude_max", models.FloatField(blank=True, null=True)),
+                ("altitude_avg", models.FloatField(blank=True, null=True)),
+                ("temperature_min", models.IntegerField(blank=True, null=True)),
+                ("temperature_max", models.IntegerField(blank=True, null=True)),
+                ("temperature_avg", models.IntegerField(blank=True, null=True)),
+                (
+                    "pace_avg",
+                    models.IntegerField(
+                        blank=True,
+                        help_text="Average pace in seconds per kilometer",
+                        null=True,
+                    ),
+                ),
+                (
+                    "pace_best",
+                    models.IntegerField(
+                        blank=True,
+                        help_text="Best pace in seconds per kilometer",
+                        null=True,
+                    ),
+                ),
+                (
+                    "cadence_avg",
+                    models.IntegerField(
+                        blank=True, help_text="Average steps per minute", null=True
+                    ),
+                ),
+                (
+                    "cadence_max",
+                    models.IntegerField(
+                        blank=True, help_text="Maximum steps per minute", null=True
+                    ),
+                ),
+                (
+                    "stride_length_avg",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Average stride length in meters",
+                        null=True,
+                    ),
+                ),
+                (
+                    "vertical_oscillation_avg",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Average vertical oscillation in cm",
+                        null=True,
+                    ),
+                ),
+                (
+                    "ground_contact_time_avg",
+                    models.IntegerField(
+                        blank=True,
+                        help_text="Average ground contact time in ms",
+                        null=True,
+                    ),
+                ),
+                (
+                    "pool_length",
+                    models.IntegerField(
+                        blank=True, help_text="Pool length in meters", null=True
+                    ),
+                ),
+                ("is_open_water", models.BooleanField(default=False)),
+                (
+                    "stroke_count",
+                    models.IntegerField(
+                        blank=True, help_text="Total number of strokes", null=True
+                    ),
+                ),
+                ("strokes_per_length_avg", models.FloatField(blank=True, null=True)),
+                (
+                    "swolf_avg",
+                    models.IntegerField(
+                        blank=True,
+                        help_text="Average swim golf score (strokes + seconds)",
+                        null=True,
+                    ),
+                ),
+                (
+                    "swolf_best",
+                    models.IntegerField(
+                        blank=True, help_text="Best swim golf score", null=True
+                    ),
+                ),
+                ("freestyle_time", models.IntegerField(blank=True, null=True)),
+                ("backstroke_time", models.IntegerField(blank=True, null=True)),
+                ("breaststroke_time", models.IntegerField(blank=True, null=True)),
+                ("butterfly_time", models.IntegerField(blank=True, null=True)),
+                ("drill_time", models.IntegerField(blank=True, null=True)),
+                ("mixed_time", models.IntegerField(blank=True, null=True)),
+                (
+                    "rest_time",
+                    models.IntegerField(
+                        blank=True, help_text="Total rest time in seconds", null=True
+                    ),
+                ),
+                (
+                    "stroke_rate_avg",
+                    models.FloatField(
+                        blank=True, help_text="Average strokes per minute", null=True
+                    ),
+                ),
+                (
+                    "speed_avg",
+                    models.FloatField(
+                        blank=True, help_text="Average speed in m/s", null=True
+                    ),
+                ),
+                (
+                    "speed_max",
+                    models.FloatField(
+                        blank=True, help_text="Maximum speed in m/s", null=True
+                    ),
+                ),
+                (
+                    "power_avg",
+                    models.IntegerField(
+                        blank=True, help_text="Average power in watts", null=True
+                    ),
+                ),
+                (
+                    "power_max",
+                    models.IntegerField(
+                        blank=True, help_text="Maximum power in watts", null=True
+                    ),
+                ),
+                (
+                    "grade_avg",
+                    models.FloatField(
+                        blank=True, help_text="Average grade in percent", null=True
+                    ),
+                ),
+                (
+                    "grade_max",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Maximum positive grade in percent",
+                        null=True,
+                    ),
+                ),
+                (
+                    "grade_min",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Maximum negative grade in percent",
+                        null=True,
+                    ),
+                ),
+                (
+                    "workout",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="metrics",
+                        serialize=False,
+                        to="workouts.workout",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(copy_metrics, restore_metrics),
+        migrations.RemoveField(
+            model_name="workout",
+            name="altitude_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="altitude_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="altitude_min",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="backstroke_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="breaststroke_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="butterfly_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="cadence_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="cadence_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="drill_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="elevation_gain",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="elevation_loss",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="freestyle_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="grade_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="grade_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="grade_min",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="ground_contact_time_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="heart_rate_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="heart_rate_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="heart_rate_min",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="is_open_water",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="mixed_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="pace_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="pace_best",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="pool_length",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="power_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="power_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="rest_time",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="speed_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="speed_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="stride_length_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="stroke_count",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="stroke_rate_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="strokes_per_length_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="swolf_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="swolf_best",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="temperature_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="temperature_max",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="temperature_min",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="time_in_hr_zones",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="training_effect_aerobic",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="training_effect_anaerobic",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="vertical_oscillation_avg",
+        ),
+        migrations.RemoveField(
+            model_name="workout",
+            name="vo2_max",
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("workouts", "0008_workoutcounterdelta"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workout",
+            name="updated_on",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
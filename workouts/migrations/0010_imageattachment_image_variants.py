@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("workouts", "0009_workout_updated_on"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageattachment",
+            name="image_variants",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
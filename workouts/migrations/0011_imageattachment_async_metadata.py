@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("workouts", "0010_imageattachment_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageattachment",
+            name="processed_on",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="imageattachment",
+            name="blurhash",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="imageattachment",
+            name="file_size",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="imageattachment",
+            name="image_dimensions",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
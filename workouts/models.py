@@ -1,11 +1,12 @@
 import dataclasses
 import datetime
-import pprint
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
+from django.core.cache import cache
 from django.db import models
 from django.urls import reverse
 
+from activitypub.documents import get_cached_document
 from activitypub.utils import generate_ulid
 from workouts.consts import (
     WORKOUT_ALPINE_SKIING,
@@ -17,6 +18,10 @@ from workouts.consts import (
 )
 
 
+def workout_document_cache_key(workout_id: int) -> str:
+    return f"workout-document:{workout_id}"
+
+
 @dataclasses.dataclass
 class QuickViewAttribute:
     label: str
@@ -33,15 +38,22 @@ class BaseWorkoutMixin(models.Model):
     )
     fit_file = models.FileField(upload_to="fit-files", null=True, blank=True)
     created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
     start_time = models.DateTimeField(null=True, blank=True)
     end_time = models.DateTimeField(null=True, blank=True)
     duration = models.PositiveIntegerField(
         null=True, blank=True, help_text="Duration in seconds"
     )
+    calories_burned = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         abstract = True
 
+    @property
+    def calories_burned_display(self):
+        calories_burned = self.calories_burned if self.calories_burned else 0
+        return f"{calories_burned} kcal"
+
     @property
     def duration_display(self):
         seconds = self.duration if self.duration else 0
@@ -114,7 +126,6 @@ class DistanceMixin(models.Model):
 class PhysiologicalMetricsMixin(models.Model):
     """Physiological metrics common to various workouts."""
 
-    calories_burned = models.PositiveIntegerField(null=True, blank=True)
     heart_rate_min = models.IntegerField(null=True, blank=True)
     heart_rate_avg = models.IntegerField(null=True, blank=True)
     heart_rate_max = models.IntegerField(null=True, blank=True)
@@ -128,11 +139,6 @@ class PhysiologicalMetricsMixin(models.Model):
     class Meta:
         abstract = True
 
-    @property
-    def calories_burned_display(self):
-        calories_burned = self.calories_burned if self.calories_burned else 0
-        return f"{calories_burned} kcal"
-
     @property
     def time_in_hr_zones_display(self):
         """
@@ -249,23 +255,27 @@ class ActivityPubMixin(models.Model):
                 pass
 
         # Process fedletic namespace properties
+        metrics = workout.get_metrics()
         for key, value in workout_object.items():
             if not key.startswith("fedletic:"):
                 continue
 
             field_name = key.replace("fedletic:", "")
+            instance = metrics if field_name in WORKOUT_METRICS_FIELDS else workout
 
             # Skip if the field doesn't exist on the model
-            if not hasattr(workout, field_name):
+            if not hasattr(instance, field_name):
                 continue
 
             # Get the field type to handle conversions
-            field = workout._meta.get_field(field_name)
+            field = instance._meta.get_field(field_name)
 
             # Handle different field types
             if isinstance(field, models.DateTimeField) and value:
                 try:
-                    setattr(workout, field_name, datetime.datetime.fromisoformat(value))
+                    setattr(
+                        instance, field_name, datetime.datetime.fromisoformat(value)
+                    )
                 except (ValueError, TypeError):
                     continue
             elif isinstance(field, (models.FloatField, models.IntegerField)) and value:
@@ -274,14 +284,14 @@ class ActivityPubMixin(models.Model):
                         value = int(value)
                     else:
                         value = float(value)
-                    setattr(workout, field_name, value)
+                    setattr(instance, field_name, value)
                 except (ValueError, TypeError):
                     continue
             else:
-                setattr(workout, field_name, value)
+                setattr(instance, field_name, value)
 
-        # Set federation URIs
-        workout.ap_uri = workout_object.get("id")
+        # Set federation URIs, the url is what activities refer to the workout by.
+        workout.ap_uri = workout_object.get("url") or workout_object.get("id")
         local_path = reverse(
             "frontend-workout",
             kwargs={"webfinger": actor.webfinger, "workout_id": workout.ap_id},
@@ -290,6 +300,7 @@ class ActivityPubMixin(models.Model):
 
         # Save the workout
         workout.save()
+        metrics.save()
 
         return workout
 
@@ -325,11 +336,7 @@ class ActivityPubMixin(models.Model):
             "id": self.ap_id,
             "type": "Workout",
             "name": self.name,
-            "published": (
-                self.start_time.isoformat()
-                if self.start_time
-                else datetime.datetime.now().isoformat()
-            ),
+            "published": (self.start_time or self.created_on).isoformat(),
             "@context": [
                 "https://www.w3.org/ns/activitystreams",
                 {"fedletic": "https://fedletic.com/ns#"},
@@ -353,52 +360,22 @@ class ActivityPubMixin(models.Model):
 
     def _get_serializable_attributes(self) -> Dict[str, Any]:
         """Extract serializable attributes from the workout model."""
-        # Fields to exclude
-        excluded_fields = [
-            "id",
-            "name",
-            "summary",
-            "fit_file",
-            "status",
-            "_state",
-            "workout_type",
-            "actor",
-            "ap_id",
-            "ap_uri",
-            "local_uri",
-            "workout_activities",
-            "note_activities",
-            "images",  # TODO: handle this.
-            "comments",  # TODO: handle this.
-        ]
-
         serialized = {}
+        metrics = self.get_metrics()
 
         # Collect field values
-        for field in self._meta.get_fields():
-            # Skip excluded fields and relationships
-            if (
-                field.name in excluded_fields
-                or isinstance(field, models.ForeignKey)
-                or isinstance(field, models.ManyToManyField)
-            ):
+        for field_name, is_datetime, is_metric in WORKOUT_SERIALIZABLE_FIELDS:
+            value = getattr(metrics if is_metric else self, field_name)
+            if value is None:
                 continue
 
-            try:
-                value = getattr(self, field.name)
-                if value is None:
-                    continue
-
-                # Format DateTimeField values
-                if isinstance(field, models.DateTimeField) and value:
-                    value = value.isoformat()
+            # Format DateTimeField values
+            if is_datetime:
+                value = value.isoformat()
 
-                # Use fedletic namespace
-                serialized[f"fedletic:{field.name}"] = value
-            except AttributeError:
-                continue
+            # Use fedletic namespace
+            serialized[f"fedletic:{field_name}"] = value
 
-        pprint.pprint(serialized)
         return serialized
 
 
@@ -531,17 +508,12 @@ class CyclingWorkoutMixin(models.Model):
 class Workout(
     BaseWorkoutMixin,
     DistanceMixin,
-    ElevationMixin,
-    PhysiologicalMetricsMixin,
-    EnvironmentalMetricsMixin,
     ActivityPubMixin,
-    RunWorkoutMixin,
-    SwimWorkoutMixin,
-    CyclingWorkoutMixin,
     models.Model,
 ):
     """
-    Unified workout model that includes fields from all workout types.
+    Unified workout model, holds what every workout has and what lists and feeds
+    show. The sport specific metrics live in WorkoutMetrics.
     """
 
     workout_type = models.CharField(
@@ -550,9 +522,37 @@ class Workout(
     comment_count = models.IntegerField(default=0)
     like_count = models.IntegerField(default=0)
 
+    # Counter changes that weren't flushed yet, see get_pending_counts.
+    pending_counts = None
+
     class Meta:
         ordering = ("start_time", "id")
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The rendered document is cached until the workout changes.
+        cache.delete(workout_document_cache_key(self.pk))
+
+    def get_activitypub_document(self) -> Tuple[bytes, str]:
+        """
+        Returns the serialized ActivityPub object of the workout and its ETag,
+        rendered once and cached until the workout is saved again.
+        """
+        return get_cached_document(
+            workout_document_cache_key(self.pk), self.as_activitypub_object
+        )
+
+    def get_metrics(self) -> "WorkoutMetrics":
+        """
+        Returns the metrics of the workout, workouts that weren't processed yet
+        have none and get an empty, unsaved, set of metrics.
+        """
+        try:
+            return self.metrics
+        except WorkoutMetrics.DoesNotExist:
+            self.metrics = WorkoutMetrics(workout=self)
+            return self.metrics
+
     def get_absolute_url(self):
         """Generate a URL to view this workout."""
         return reverse("workout_detail", kwargs={"pk": self.pk})
@@ -585,6 +585,28 @@ class Workout(
 
         return attrs
 
+    def get_pending_counts(self) -> Tuple[int, int]:
+        """
+        Returns the (likes, comments) changes that weren't flushed into the
+        counters yet, unless they were loaded with merge_pending_counts or
+        annotate_pending_counts.
+        """
+        if self.pending_counts is None and hasattr(self, "pending_likes"):
+            self.pending_counts = (self.pending_likes, self.pending_comments)
+        if self.pending_counts is None:
+            self.pending_counts = WorkoutCounterDelta.get_pending_counts([self.pk]).get(
+                self.pk, (0, 0)
+            )
+        return self.pending_counts
+
+    @property
+    def current_like_count(self) -> int:
+        return self.like_count + self.get_pending_counts()[0]
+
+    @property
+    def current_comment_count(self) -> int:
+        return self.comment_count + self.get_pending_counts()[1]
+
     @property
     def workout_attributes(self):
         """
@@ -598,141 +620,240 @@ class Workout(
                 - display_value: Formatted value for display
         """
         attributes = []
-
-        # Map of field names to human-readable labels
-        field_labels = {
-            # Base workout fields
-            "duration": "Duration",
-            # Distance fields"
-            "distance_in_meters": "Distance",
-            # Physiological metrics
-            "calories_burned": "Calories Burned",
-            "heart_rate_min": "Min Heart Rate",
-            "heart_rate_avg": "Average Heart Rate",
-            "heart_rate_max": "Max Heart Rate",
-            "training_effect_aerobic": "Aerobic Training Effect",
-            "training_effect_anaerobic": "Anaerobic Training Effect",
-            "vo2_max": "VO2 Max",
-            # Environmental metrics
-            "altitude_min": "Min Altitude",
-            "altitude_max": "Max Altitude",
-            "altitude_avg": "Average Altitude",
-            "temperature_min": "Min Temperature",
-            "temperature_max": "Max Temperature",
-            "temperature_avg": "Average Temperature",
-            # Running fields
-            "pace_avg": "Average Pace",
-            "pace_best": "Best Pace",
-            "cadence_avg": "Average Cadence",
-            "cadence_max": "Maximum Cadence",
-            "stride_length_avg": "Average Stride Length",
-            "vertical_oscillation_avg": "Average Vertical Oscillation",
-            "ground_contact_time_avg": "Average Ground Contact Time",
-            "elevation_gain": "Elevation Gain",
-            "elevation_loss": "Elevation Loss",
-            # Swimming fields
-            "pool_length": "Pool Length",
-            "is_open_water": "Open Water",
-            "stroke_count": "Stroke Count",
-            "strokes_per_length_avg": "Average Strokes per Length",
-            "swolf_avg": "Average SWOLF",
-            "swolf_best": "Best SWOLF",
-            "freestyle_time": "Freestyle Time",
-            "backstroke_time": "Backstroke Time",
-            "breaststroke_time": "Breaststroke Time",
-            "butterfly_time": "Butterfly Time",
-            "drill_time": "Drill Time",
-            "mixed_time": "Mixed Time",
-            "rest_time": "Rest Time",
-            "stroke_rate_avg": "Average Stroke Rate",
-            # Cycling fields
-            "speed_avg": "Average Speed",
-            "speed_max": "Max Speed",
-            "power_avg": "Average Power",
-            "power_max": "Max Power",
-            "grade_avg": "Average Grade",
-            "grade_max": "Maximum Grade",
-            "grade_min": "Minimum Grade",
-        }
-
-        # Fields with custom display properties
-        display_properties = {
-            "duration": "duration_display",
-            "distance_in_meters": "distance_in_meters_display",
-            "calories_burned": "calories_burned_display",
-            "pace_avg": "pace_display",
-            "speed_avg": "speed_display",
-            "elevation_gain": "elevation_gain_display",
-            "elevation_loss": "elevation_loss_display",
-            "time_in_hr_zones": "time_in_hr_zones_display",
-            "workout_type": "get_workout_type_display",
-        }
-
-        # Get all fields from the model
-        for field in self._meta.get_fields():
-            # Skip many-to-many relationships, foreign keys, and some internal fields
-            if field.name.startswith("_") or field.name in [
-                "workout_activities",
-                "note_activities",
-                "images",
-                "comments",
-                "actor",
-                "ap_id",
-                "ap_uri",
-                "local_uri",
-                "fit_file",
-                "id",
-                "status",
-                "name",
-                "summary",
-                "created_on",
-                "updated_on",
-            ]:
-                continue
-
-            # Skip if it's a relationship field
-            if field.is_relation:
-                continue
-
-            # Get the raw value
-            value = getattr(self, field.name, None)
-
-            # Skip if the value is None
+        metrics = self.get_metrics()
+        for field_name, label, formatter, is_metric in WORKOUT_ATTRIBUTE_PLAN:
+            instance = metrics if is_metric else self
+            value = getattr(instance, field_name)
             if value is None:
                 continue
 
-            # Get the display value
-            display_value = None
-            if field.name in display_properties:
-                display_property = display_properties[field.name]
-                display_value = getattr(self, display_property, str(value))
-            else:
-                # Format datetime fields
-                if isinstance(value, datetime.datetime):
-                    display_value = value.strftime("%Y-%m-%d %H:%M:%S")
-                # Format boolean fields
-                elif isinstance(value, bool):
-                    display_value = "Yes" if value else "No"
-                # Format float fields
-                elif isinstance(value, float):
-                    display_value = f"{value:.2f}"
-                else:
-                    display_value = str(value)
-
-            # Get the label
-            label = field_labels.get(field.name, field.name.replace("_", " ").title())
-
             attributes.append(
                 {
-                    "key": field.name,
+                    "key": field_name,
                     "label": label,
                     "value": value,
-                    "display_value": display_value,
+                    "display_value": formatter(instance, value),
                 }
             )
 
-        # Sort by labels
-        return sorted(attributes, key=lambda x: x["label"])
+        return attributes
+
+
+class WorkoutMetrics(
+    ElevationMixin,
+    PhysiologicalMetricsMixin,
+    EnvironmentalMetricsMixin,
+    RunWorkoutMixin,
+    SwimWorkoutMixin,
+    CyclingWorkoutMixin,
+    models.Model,
+):
+    """
+    The metrics of a workout, most of which only apply to some workout types.
+    Kept out of the workout table so lists and feeds don't have to read them,
+    they're only needed when a single workout is shown or serialized.
+    """
+
+    workout = models.OneToOneField(
+        Workout, primary_key=True, related_name="metrics", on_delete=models.CASCADE
+    )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The metrics are part of the rendered workout document.
+        cache.delete(workout_document_cache_key(self.workout_id))
+
+
+# Names of the fields that are stored on WorkoutMetrics rather than on Workout.
+WORKOUT_METRICS_FIELDS = {
+    field.name for field in WorkoutMetrics._meta.fields if not field.is_relation
+}
+
+
+# Map of field names to human-readable labels
+WORKOUT_ATTRIBUTE_LABELS = {
+    # Base workout fields
+    "duration": "Duration",
+    # Distance fields"
+    "distance_in_meters": "Distance",
+    # Physiological metrics
+    "calories_burned": "Calories Burned",
+    "heart_rate_min": "Min Heart Rate",
+    "heart_rate_avg": "Average Heart Rate",
+    "heart_rate_max": "Max Heart Rate",
+    "training_effect_aerobic": "Aerobic Training Effect",
+    "training_effect_anaerobic": "Anaerobic Training Effect",
+    "vo2_max": "VO2 Max",
+    # Environmental metrics
+    "altitude_min": "Min Altitude",
+    "altitude_max": "Max Altitude",
+    "altitude_avg": "Average Altitude",
+    "temperature_min": "Min Temperature",
+    "temperature_max": "Max Temperature",
+    "temperature_avg": "Average Temperature",
+    # Running fields
+    "pace_avg": "Average Pace",
+    "pace_best": "Best Pace",
+    "cadence_avg": "Average Cadence",
+    "cadence_max": "Maximum Cadence",
+    "stride_length_avg": "Average Stride Length",
+    "vertical_oscillation_avg": "Average Vertical Oscillation",
+    "ground_contact_time_avg": "Average Ground Contact Time",
+    "elevation_gain": "Elevation Gain",
+    "elevation_loss": "Elevation Loss",
+    # Swimming fields
+    "pool_length": "Pool Length",
+    "is_open_water": "Open Water",
+    "stroke_count": "Stroke Count",
+    "strokes_per_length_avg": "Average Strokes per Length",
+    "swolf_avg": "Average SWOLF",
+    "swolf_best": "Best SWOLF",
+    "freestyle_time": "Freestyle Time",
+    "backstroke_time": "Backstroke Time",
+    "breaststroke_time": "Breaststroke Time",
+    "butterfly_time": "Butterfly Time",
+    "drill_time": "Drill Time",
+    "mixed_time": "Mixed Time",
+    "rest_time": "Rest Time",
+    "stroke_rate_avg": "Average Stroke Rate",
+    # Cycling fields
+    "speed_avg": "Average Speed",
+    "speed_max": "Max Speed",
+    "power_avg": "Average Power",
+    "power_max": "Max Power",
+    "grade_avg": "Average Grade",
+    "grade_max": "Maximum Grade",
+    "grade_min": "Minimum Grade",
+}
+
+# Fields with custom display properties
+WORKOUT_ATTRIBUTE_DISPLAY_PROPERTIES = {
+    "duration": "duration_display",
+    "distance_in_meters": "distance_in_meters_display",
+    "calories_burned": "calories_burned_display",
+    "pace_avg": "pace_display",
+    "speed_avg": "speed_display",
+    "elevation_gain": "elevation_gain_display",
+    "elevation_loss": "elevation_loss_display",
+    "time_in_hr_zones": "time_in_hr_zones_display",
+    "workout_type": "get_workout_type_display",
+}
+
+# Fields that are never shown as workout attributes
+WORKOUT_ATTRIBUTE_EXCLUDED_FIELDS = {
+    "workout_activities",
+    "note_activities",
+    "images",
+    "comments",
+    "actor",
+    "ap_id",
+    "ap_uri",
+    "local_uri",
+    "fit_file",
+    "id",
+    "status",
+    "name",
+    "summary",
+    "created_on",
+    "updated_on",
+}
+
+
+def _format_display_property(display_property: str):
+    def formatter(instance, value):
+        display_value = getattr(instance, display_property, str(value))
+        # Django's get_FOO_display is a method.
+        return display_value() if callable(display_value) else display_value
+
+    return formatter
+
+
+def _format_choice(field: models.Field):
+    # What get_FOO_display does, without building the choices on every call.
+    labels = dict(field.flatchoices)
+
+    def formatter(instance, value):
+        return str(labels.get(value, value))
+
+    return formatter
+
+
+def _format_value(instance, value):
+    # Format datetime fields
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    # Format boolean fields
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    # Format float fields
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def compile_workout_attribute_plan() -> List[Tuple[str, str, Callable, bool]]:
+    """
+    Works out which fields are shown as workout attributes, their label, how
+    their value is formatted and whether they're stored on WorkoutMetrics,
+    sorted by label. This only depends on the models, so it's done once at
+    import and workout_attributes just runs the plan.
+    """
+    plan = []
+    # Forward fields only, reverse relations aren't known until all apps are loaded.
+    fields = [(field, False) for field in Workout._meta.fields]
+    fields += [(field, True) for field in WorkoutMetrics._meta.fields]
+    for field, is_metric in fields:
+        # Skip many-to-many relationships, foreign keys, and some internal fields
+        if field.is_relation or field.name.startswith("_"):
+            continue
+        if field.name in WORKOUT_ATTRIBUTE_EXCLUDED_FIELDS:
+            continue
+
+        display_property = WORKOUT_ATTRIBUTE_DISPLAY_PROPERTIES.get(field.name)
+        if display_property == f"get_{field.name}_display" and field.choices:
+            formatter = _format_choice(field)
+        elif display_property:
+            formatter = _format_display_property(display_property)
+        else:
+            formatter = _format_value
+
+        label = WORKOUT_ATTRIBUTE_LABELS.get(
+            field.name, field.name.replace("_", " ").title()
+        )
+        plan.append((field.name, label, formatter, is_metric))
+
+    return sorted(plan, key=lambda attribute: attribute[1])
+
+
+WORKOUT_ATTRIBUTE_PLAN = compile_workout_attribute_plan()
+
+# Fields that are not part of the ActivityPub object of a workout
+WORKOUT_SERIALIZATION_EXCLUDED_FIELDS = {
+    "id",
+    "name",
+    "summary",
+    "fit_file",
+    "status",
+    "workout_type",
+    "ap_id",
+    "ap_uri",
+    "local_uri",
+    "updated_on",
+    # Counters are updated in place, they'd go stale in the cached document.
+    "comment_count",
+    "like_count",
+}
+
+# (field name, is datetime, is metric) of the fields that are serialized as fedletic:<field>.
+WORKOUT_SERIALIZABLE_FIELDS = [
+    (
+        field.name,
+        isinstance(field, models.DateTimeField),
+        field.name in WORKOUT_METRICS_FIELDS,
+    )
+    for field in Workout._meta.fields + WorkoutMetrics._meta.fields
+    if not field.is_relation and field.name not in WORKOUT_SERIALIZATION_EXCLUDED_FIELDS
+]
 
 
 class Comment(models.Model):
@@ -772,13 +893,49 @@ class Like(models.Model):
     actor = models.ForeignKey("activitypub.Actor", on_delete=models.CASCADE)
 
 
+class WorkoutCounterDelta(models.Model):
+    """
+    A change to the like and comment counters of a workout. Changes are appended
+    here instead of updating the workout row right away, so a busy workout
+    doesn't have every like wait on its row lock. They're folded into the
+    counters periodically, see flush_counter_deltas.
+    """
+
+    workout = models.ForeignKey(
+        "workouts.Workout", related_name="+", on_delete=models.CASCADE
+    )
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    @staticmethod
+    def get_pending_counts(workout_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+        """Returns the summed (likes, comments) changes of the given workouts."""
+        pending = (
+            WorkoutCounterDelta.objects.filter(workout__in=workout_ids)
+            .order_by()
+            .values("workout")
+            .annotate(
+                total_likes=models.Sum("likes"), total_comments=models.Sum("comments")
+            )
+        )
+        return {
+            row["workout"]: (row["total_likes"], row["total_comments"])
+            for row in pending
+        }
+
+
 class ImageAttachment(models.Model):
     id = models.CharField(primary_key=True, default=generate_ulid, editable=False)
     workout = models.ForeignKey(
         "workouts.Workout", related_name="images", on_delete=models.CASCADE
     )
     image = models.ImageField(upload_to="workout-images")
-    blurhash = models.TextField()
-    image_dimensions = models.JSONField()
-    file_size = models.IntegerField()
+    # Resized variants of the image, see fedletic.images.generate_variants.
+    image_variants = models.JSONField(null=True, blank=True)
+    # Only the raw upload is stored on creation, process_image_attachment fills
+    # in the rest in a worker and sets processed_on.
+    blurhash = models.TextField(null=True, blank=True)
+    image_dimensions = models.JSONField(null=True, blank=True)
+    file_size = models.IntegerField(null=True, blank=True)
     file_name = models.CharField()
+    processed_on = models.DateTimeField(null=True, blank=True)
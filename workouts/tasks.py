@@ -1,11 +1,18 @@
+import logging
+
+from django.conf import settings
+
+from activitypub import methods as ap_methods
 from activitypub.consts import ACTIVITY_TYPE_CREATE
-from activitypub.models import Activity
-from activitypub.tasks.publish_activity import publish_activity
+from activitypub.models import Activity, Actor
 from fedletic.celery import app
 from feeds.methods import distribute_to_feed
+from workouts import events as wo_events
 from workouts import methods as wo_methods
 from workouts.consts import WORKOUT_STATUS_FINISHED, WORKOUT_STATUS_PROCESSING
-from workouts.models import Workout
+from workouts.models import ImageAttachment, Workout
+
+log = logging.getLogger(__name__)
 
 
 @app.task()
@@ -22,6 +29,8 @@ def process_workout(workout_id):
 
     workout.status = WORKOUT_STATUS_FINISHED
     workout.save(update_fields=["status"])
+    # Render the ActivityPub object now, remote servers fetch it right after publishing.
+    workout.get_activitypub_document()
 
     # Create the activity for sending the Note.
     note_activity = Activity.create_from_kwargs(
@@ -68,20 +77,31 @@ def process_workout(workout_id):
 
     # And publish the Note & Workout activity,
     # this goes out to non-local users only.
-    for shared_inbox in workout.actor.followers_shared_inboxes:
-        publish_activity.apply(
-            kwargs={
-                "activity_id": note_activity.id,
-                "inbox_url": shared_inbox,
-            }
-        )
-        publish_activity.apply(
-            kwargs={
-                "activity_id": workout_activity.id,
-                "inbox_url": shared_inbox,
-            }
-        )
+    ap_methods.publish_to_audience(activity=note_activity)
+    ap_methods.publish_to_audience(activity=workout_activity)
 
     # TODO: Publish the workout activity.
     # Next up, we share it to local followers + own user.
     distribute_to_feed(source=workout.actor, content_object=workout)
+
+
+@app.task()
+def flush_counter_deltas():
+    updated = wo_methods.flush_counter_deltas()
+    log.info("Flushed counter deltas into workouts=%s", updated)
+    return updated
+
+
+@app.task()
+def process_image_attachment(attachment_id):
+    attachment = ImageAttachment.objects.get(id=attachment_id)
+    wo_methods.process_image_attachment(attachment)
+    log.info("Processed image attachment=%s", attachment_id)
+
+
+@app.task(bind=True, max_retries=settings.WORKOUT_IMPORT_MAX_RETRIES)
+def retry_remote_workout_import(self, url, ap_uri, actor_id):
+    """Imports a remote workout whose import was held up by another delivery."""
+    actor = Actor.objects.get(pk=actor_id)
+    if not wo_events.import_remote_workout(url=url, ap_uri=ap_uri, actor=actor):
+        raise self.retry(countdown=settings.WORKOUT_IMPORT_RETRY_DELAY)
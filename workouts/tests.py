@@ -0,0 +1,104 @@
+import shutil
+import tempfile
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from activitypub.models import Actor
+from workouts import events as wo_events
+from workouts import methods as wo_methods
+from workouts.models import Workout
+from workouts.tasks import retry_remote_workout_import
+
+
+def create_photo(name="photo.jpg"):
+    output = BytesIO()
+    Image.new("RGB", (64, 48), "orange").save(output, format="JPEG")
+    return SimpleUploadedFile(name, output.getvalue(), content_type="image/jpeg")
+
+
+class ImageAttachmentTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        actor = Actor.objects.create(webfinger="athlete@example.com", name="Athlete")
+        self.workout = Workout.objects.create(
+            actor=actor, name="Ride", workout_type="cycling", fit_file="ride.fit"
+        )
+
+    @mock.patch("workouts.tasks.process_image_attachment.delay")
+    def test_create_queues_processing_on_commit(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = wo_methods.create_image_attachment(
+                self.workout, create_photo()
+            )
+            delay.assert_not_called()
+
+        delay.assert_called_once_with(attachment_id=attachment.pk)
+        self.assertIsNone(attachment.processed_on)
+        self.assertEqual(attachment.file_name, "photo.jpg")
+
+
+class ImportRemoteWorkoutTestCase(TestCase):
+    URL = "https://remote.example/@runner/workouts/01JV9ZQ5C8W3N8YH1T2Q6M4K7R"
+
+    def setUp(self):
+        self.actor = Actor.objects.create(
+            webfinger="runner@remote.example", name="Runner", is_remote=True
+        )
+        # Activities refer to a workout by its url, as in workouts.tasks.
+        self.activity = SimpleNamespace(
+            actor=self.actor,
+            actor_id=self.actor.pk,
+            object_json={"content": self.URL, "id": self.URL},
+        )
+        # What fetching the url returns, see Workout.as_activitypub_object.
+        self.ap_object = {
+            "id": "01JV9ZQ5C8W3N8YH1T2Q6M4K7R",
+            "type": "Workout",
+            "name": "Ride",
+            "url": self.URL,
+            "fedletic:workout_type": "cycling",
+        }
+
+    def test_imports_a_workout_once(self):
+        with mock.patch(
+            "workouts.events.fetch_object", return_value=self.ap_object
+        ) as fetch_object:
+            wo_events.process_incoming_workout(self.activity)
+            wo_events.process_incoming_workout(self.activity)
+
+        fetch_object.assert_called_once_with(self.URL)
+        self.assertEqual(Workout.objects.filter(ap_uri=self.URL).count(), 1)
+
+    def test_retries_when_the_winner_fails(self):
+        retries = []
+
+        def failing_fetch(url):
+            # Another delivery of the workout arrives while this one is fetching.
+            with mock.patch(
+                "workouts.tasks.retry_remote_workout_import.apply_async"
+            ) as apply_async:
+                wo_events.process_incoming_workout(self.activity)
+            retries.extend(apply_async.call_args_list)
+            return None
+
+        with mock.patch("workouts.events.fetch_object", side_effect=failing_fetch):
+            wo_events.process_incoming_workout(self.activity)
+
+        self.assertFalse(Workout.objects.filter(ap_uri=self.URL).exists())
+        self.assertEqual(len(retries), 1)
+
+        # The held up delivery imports the workout once the failed one is done.
+        with mock.patch("workouts.events.fetch_object", return_value=self.ap_object):
+            retry_remote_workout_import.apply(kwargs=retries[0].kwargs["kwargs"])
+
+        self.assertEqual(Workout.objects.filter(ap_uri=self.URL).count(), 1)